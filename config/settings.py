@@ -39,6 +39,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "task_manager.middleware.MetricsMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -76,6 +77,35 @@ DATABASES = {
     }
 }
 
+# Dotted path of the full-text search backend, picked from the database
+# vendor when unset (SQLite FTS5 or PostgreSQL).
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND_ENV")
+
+
+CACHE_URL = os.getenv("CACHE_URL_ENV")
+
+if CACHE_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Whether the web and worker processes all see the same cache. Otherwise
+# memberships, unread counts, versions and responses are only cached
+# while a single process runs, as one process wouldn't see another
+# invalidate them.
+CACHE_SHARED = (
+    os.getenv("CACHE_SHARED_ENV", str(bool(CACHE_URL))) in TRUE_VALUES
+)
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -111,16 +141,81 @@ SWAGGER_SETTINGS = {
     "USE_SESSION_AUTH": False,
 }
 
+# Pub/sub used to push live workspace events; in-process when unset.
+REALTIME_BROKER_URL = os.getenv("REALTIME_BROKER_URL_ENV")
+
+# Every request is counted and timed by view; METRICS_SAMPLE_RATE of them
+# also record their queries, database and serialization time. /metrics
+# needs "Authorization: Bearer <METRICS_TOKEN>", and without a token is
+# only served in DEBUG. Processes share their metrics through the
+# cache, so without CACHE_SHARED it only shows the process answering.
+METRICS_SAMPLE_RATE = float(os.getenv("METRICS_SAMPLE_RATE_ENV", "0"))
+METRICS_REPEATED_QUERY_THRESHOLD = int(
+    os.getenv("METRICS_REPEATED_QUERY_THRESHOLD_ENV", "10")
+)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN_ENV")
+
+# Share of Celery task runs profiled with cProfile, saved as .prof files.
+JOB_PROFILE_SAMPLE_RATE = float(os.getenv("JOB_PROFILE_SAMPLE_RATE_ENV", "0"))
+JOB_PROFILE_DIR = BASE_DIR / "profiles" / "jobs"
+
 CELERY_BROKER_URL = "redis://localhost:6379/0"
 CELERY_RESULT_BACKEND = "redis://localhost:6379/0"
+CELERY_TASK_ALWAYS_EAGER = (
+    os.getenv("CELERY_TASK_ALWAYS_EAGER_ENV", "False") in TRUE_VALUES
+)
+
+# "poll" scans for upcoming deadlines every minute, "eta" schedules one
+# reminder per task when it is saved and only sweeps hourly for misses.
+DEADLINE_REMINDERS_MODE = os.getenv("DEADLINE_REMINDERS_MODE_ENV", "poll")
+
+# Read notifications are deleted after NOTIFICATION_RETENTION_DAYS, unread
+# ones are archived to NOTIFICATION_ARCHIVE_DIR and deleted after
+# NOTIFICATION_ARCHIVE_DAYS.
+NOTIFICATION_RETENTION_DAYS = int(
+    os.getenv("NOTIFICATION_RETENTION_DAYS_ENV", "30")
+)
+NOTIFICATION_ARCHIVE_DAYS = int(
+    os.getenv("NOTIFICATION_ARCHIVE_DAYS_ENV", "90")
+)
+NOTIFICATION_ARCHIVE_DIR = BASE_DIR / "archive" / "notifications"
+
+# Deletions are kept for the delta sync endpoint this long; older sync
+# tokens get a 410 and the client has to do a full sync.
+SYNC_TOMBSTONE_RETENTION_DAYS = int(
+    os.getenv("SYNC_TOMBSTONE_RETENTION_DAYS_ENV", "30")
+)
 
 CELERY_BEAT_SCHEDULE = {
-    "check-deadlines-every-5-min": {
-        "task": "task_manager.tasks.notify_upcoming_deadlines",
-        "schedule": crontab(minute="*/1"),
+    "purge-notifications-daily": {
+        "task": "task_manager.tasks.purge_notifications",
+        "schedule": crontab(hour=3, minute=0),
+    },
+    "purge-stale-uploads-daily": {
+        "task": "task_manager.tasks.purge_stale_uploads",
+        "schedule": crontab(hour=3, minute=30),
+    },
+    "purge-tombstones-daily": {
+        "task": "task_manager.tasks.purge_tombstones",
+        "schedule": crontab(hour=3, minute=45),
+    },
+    "purge-orphaned-blobs-daily": {
+        "task": "task_manager.tasks.purge_orphaned_blobs",
+        "schedule": crontab(hour=4, minute=0),
     },
 }
 
+if DEADLINE_REMINDERS_MODE == "eta":
+    CELERY_BEAT_SCHEDULE["reconcile-deadline-reminders-hourly"] = {
+        "task": "task_manager.tasks.reconcile_deadline_reminders",
+        "schedule": crontab(minute=0),
+    }
+else:
+    CELERY_BEAT_SCHEDULE["check-deadlines-every-5-min"] = {
+        "task": "task_manager.tasks.notify_upcoming_deadlines",
+        "schedule": crontab(minute="*/1"),
+    }
+
 
 LANGUAGE_CODE = "en-us"
 
@@ -132,7 +227,31 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+    },
+    "task_files": {
+        "BACKEND": "task_manager.storage.ContentAddressedStorage",
+    },
+}
+
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
+CHUNKED_UPLOAD_ROOT = MEDIA_ROOT / "uploads"
+CHUNKED_UPLOAD_EXPIRE_DAYS = 2
+CHUNKED_UPLOAD_MAX_SIZE = int(
+    os.getenv("CHUNKED_UPLOAD_MAX_SIZE_ENV", str(2 * 1024**3))
+)
+# Parts are numbered from 0 up to this limit, excluded.
+CHUNKED_UPLOAD_MAX_PARTS = 10000
+
+# "django" streams attachments from the app, "x-accel" (nginx) and
+# "x-sendfile" (Apache, lighttpd) hand them off to the front-end server.
+FILE_DOWNLOAD_BACKEND = os.getenv("FILE_DOWNLOAD_BACKEND_ENV", "django")
+FILE_DOWNLOAD_ACCEL_PREFIX = "/protected-media/"
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
@@ -0,0 +1,523 @@
+import json
+import math
+import random
+import uuid
+from datetime import date, timedelta
+from time import perf_counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from task_manager.cache import (
+    bump_content_versions,
+    invalidate_unread_counts,
+    invalidate_workspace_ids,
+)
+from task_manager.models import (
+    Comment,
+    Notification,
+    Task,
+    TaskFile,
+    Workspace,
+)
+from task_manager.search import get_search_backend
+from task_manager.storage import get_task_file_storage
+
+
+User = get_user_model()
+
+PASSWORD = "benchmark-password"
+SEED_BATCH_SIZE = 1000
+NOTIFICATIONS = 100
+WORDS = (
+    "api board bug budget call client deploy design docs draft email "
+    "estimate feature fix invoice launch meeting migration mobile onboard "
+    "plan release report research review roadmap sales security sprint "
+    "support survey test update vendor website"
+).split()
+
+# (name, method, path, body): the path and the strings of the body are
+# formatted with Dataset.context(); a body may also be a callable of it.
+SCENARIOS = [
+    ("workspaces.list", "GET", "/api/workspaces/", None),
+    ("workspaces.retrieve", "GET", "/api/workspaces/{workspace}/", None),
+    (
+        "workspaces.changes",
+        "GET",
+        "/api/workspaces/{workspace}/changes/",
+        None,
+    ),
+    ("workspaces.export", "GET", "/api/workspaces/{workspace}/export/", None),
+    ("workspace-details", "GET", "/api/workspace/{workspace}/", None),
+    ("tasks.list", "GET", "/api/tasks/", None),
+    (
+        "tasks.list.workspace",
+        "GET",
+        "/api/tasks/?workflow_id={workspace}",
+        None,
+    ),
+    (
+        "tasks.list.filtered",
+        "GET",
+        "/api/tasks/?workflow_id={workspace}&status=todo&status=in_progress"
+        "&ordering=deadline",
+        None,
+    ),
+    ("tasks.retrieve", "GET", "/api/tasks/{task}/", None),
+    (
+        "tasks.by-date",
+        "GET",
+        "/api/tasks/by-date/?workspace_id={workspace}&date={today}",
+        None,
+    ),
+    (
+        "tasks.calendar",
+        "GET",
+        "/api/tasks/calendar/?workspace_id={workspace}&from={today}"
+        "&to={next_month}",
+        None,
+    ),
+    ("comments.list", "GET", "/api/comments/", None),
+    ("comments.retrieve", "GET", "/api/comments/{comment}/", None),
+    (
+        "comments.by-workspace",
+        "GET",
+        "/api/comments/by-workspace/?workspace_id={workspace}",
+        None,
+    ),
+    ("files.list", "GET", "/api/files/", None),
+    ("files.download", "GET", "/api/files/{file}/download/", None),
+    ("notifications.list", "GET", "/api/notifications/", None),
+    (
+        "notifications.unread-count",
+        "GET",
+        "/api/notifications/unread-count/",
+        None,
+    ),
+    ("search", "GET", "/api/search/?q={word}", None),
+    ("users.me", "GET", "/users/me/", None),
+    ("users.profile", "GET", "/users/profile/{user}/", None),
+    (
+        "users.token.verify",
+        "POST",
+        "/users/token/verify/",
+        {"token": "{access}"},
+    ),
+    (
+        "users.token.refresh",
+        "POST",
+        "/users/token/refresh/",
+        {"refresh": "{refresh}"},
+    ),
+    (
+        "users.token",
+        "POST",
+        "/users/token/",
+        {"username": "{username}", "password": PASSWORD},
+    ),
+    (
+        "users.register",
+        "POST",
+        "/users/register/",
+        {
+            "username": "{prefix}-new-{i}",
+            "password": PASSWORD,
+            "password2": PASSWORD,
+        },
+    ),
+    ("workspaces.create", "POST", "/api/workspaces/", {"name": "{title}"}),
+    (
+        "tasks.create",
+        "POST",
+        "/api/tasks/",
+        {
+            "workspace": "{workspace}",
+            "title": "{title}",
+            "assignee_ids": ["{user}"],
+        },
+    ),
+    ("tasks.update", "PATCH", "/api/tasks/{task}/", {"status": "{status}"}),
+    (
+        "tasks.bulk",
+        "POST",
+        "/api/tasks/bulk/",
+        lambda context: [
+            {
+                "workspace": context["workspace"],
+                "title": f"{context['title']} {n}",
+            }
+            for n in range(20)
+        ],
+    ),
+    (
+        "comments.create",
+        "POST",
+        "/api/comments/",
+        {"task": "{task}", "text": "{title}"},
+    ),
+    ("notifications.mark-read", "POST", "/api/notifications/mark-read/", {}),
+]
+
+
+def _sentence(rng, low, high):
+    return " ".join(rng.choices(WORDS, k=rng.randint(low, high)))
+
+
+class Dataset:
+    """
+    Synthetic users, workspaces, tasks, files, comments and
+    notifications. ``users[0]`` is a member of every workspace and is the
+    one requests are made as.
+    """
+
+    def __init__(
+        self,
+        users=20,
+        workspaces=5,
+        members=10,
+        tasks=200,
+        comments=3,
+        files=1,
+        seed=0,
+    ):
+        self.scale = {
+            "users": users,
+            "workspaces": workspaces,
+            "members": members,
+            "tasks": tasks,
+            "comments": comments,
+            "files": files,
+            "seed": seed,
+        }
+        self.rng = random.Random(seed)
+        self.prefix = f"bench-{uuid.uuid4().hex[:8]}"
+        self.users = []
+        self.workspaces = []
+        self.tasks = []
+        self.comments = []
+        self.files = []
+        self.blob = None
+
+    def seed(self):
+        """Inserts the data with bulk inserts; signals aren't sent."""
+        rng, scale = self.rng, self.scale
+        password = make_password(PASSWORD)
+        self.users = User.objects.bulk_create(
+            User(username=f"{self.prefix}-{i}", password=password)
+            for i in range(max(scale["users"], 1))
+        )
+        owner = self.users[0]
+
+        workspaces = Workspace.objects.bulk_create(
+            Workspace(name=_sentence(rng, 1, 3).title(), creator=owner)
+            for _ in range(scale["workspaces"])
+        )
+        self.workspaces = [workspace.pk for workspace in workspaces]
+        members = {
+            workspace: [owner.pk]
+            + [
+                user.pk
+                for user in rng.sample(
+                    self.users[1:],
+                    min(scale["members"] - 1, len(self.users) - 1),
+                )
+            ]
+            for workspace in self.workspaces
+        }
+        Workspace.members.through.objects.bulk_create(
+            Workspace.members.through(workspace_id=workspace, user_id=user)
+            for workspace, user_ids in members.items()
+            for user in user_ids
+        )
+
+        now = timezone.now()
+        tasks = Task.objects.bulk_create(
+            (
+                Task(
+                    workspace_id=workspace,
+                    title=_sentence(rng, 2, 6).capitalize(),
+                    description=_sentence(rng, 0, 60),
+                    deadline=(
+                        now + timedelta(days=rng.uniform(-30, 60))
+                        if rng.random() < 0.8
+                        else None
+                    ),
+                    priority=rng.choices(["low", "medium", "high"], [2, 5, 3])[
+                        0
+                    ],
+                    status=rng.choices(
+                        ["todo", "in_progress", "done"], [5, 2, 3]
+                    )[0],
+                    creator_id=rng.choice(members[workspace]),
+                )
+                for workspace in self.workspaces
+                for _ in range(scale["tasks"])
+            ),
+            batch_size=SEED_BATCH_SIZE,
+        )
+        self.tasks = [task.pk for task in tasks]
+        Task.assignees.through.objects.bulk_create(
+            (
+                Task.assignees.through(task_id=task.pk, user_id=user)
+                for task in tasks
+                for user in rng.sample(
+                    members[task.workspace_id],
+                    min(rng.randint(0, 3), len(members[task.workspace_id])),
+                )
+            ),
+            batch_size=SEED_BATCH_SIZE,
+        )
+
+        files = []
+        if scale["files"]:
+            self.blob = get_task_file_storage().save(
+                "task_files/benchmark.txt",
+                ContentFile(b"Benchmark attachment.\n"),
+            )
+            files = TaskFile.objects.bulk_create(
+                (
+                    TaskFile(
+                        task_id=task.pk,
+                        name=f"{rng.choice(WORDS)}.txt",
+                        file=self.blob,
+                    )
+                    for task in tasks
+                    for _ in range(rng.randint(0, 2 * scale["files"]))
+                ),
+                batch_size=SEED_BATCH_SIZE,
+            )
+            self.files = [task_file.pk for task_file in files]
+        files_by_task = {}
+        for task_file in files:
+            files_by_task.setdefault(task_file.task_id, []).append(
+                task_file.pk
+            )
+
+        comments = Comment.objects.bulk_create(
+            (
+                Comment(
+                    task_id=task.pk,
+                    author_id=rng.choice(members[task.workspace_id]),
+                    text=_sentence(rng, 3, 40),
+                )
+                for task in tasks
+                for _ in range(rng.randint(0, 2 * scale["comments"]))
+            ),
+            batch_size=SEED_BATCH_SIZE,
+        )
+        self.comments = [comment.pk for comment in comments]
+        Comment.files.through.objects.bulk_create(
+            (
+                Comment.files.through(
+                    comment_id=comment.pk,
+                    taskfile_id=rng.choice(files_by_task[comment.task_id]),
+                )
+                for comment in comments
+                if comment.task_id in files_by_task and rng.random() < 0.1
+            ),
+            batch_size=SEED_BATCH_SIZE,
+        )
+
+        Notification.objects.bulk_create(
+            Notification(
+                user=owner,
+                task_id=task,
+                message=f"Deadline approaching for task {task}",
+                is_read=rng.random() < 0.5,
+            )
+            for task in rng.sample(
+                self.tasks, min(NOTIFICATIONS, len(self.tasks))
+            )
+        )
+
+        backend = get_search_backend()
+        for workspace in self.workspaces:
+            backend.rebuild(workspace_id=workspace)
+
+        refresh = RefreshToken.for_user(owner)
+        self.refresh, self.access = str(refresh), str(refresh.access_token)
+
+    def context(self, i):
+        """The values request ``i`` is formatted with."""
+        rng = self.rng
+        today = date.today()
+        return {
+            "i": i,
+            "prefix": self.prefix,
+            "username": self.users[0].username,
+            "user": rng.choice(self.users).pk,
+            "workspace": rng.choice(self.workspaces) if self.workspaces else 0,
+            "task": rng.choice(self.tasks) if self.tasks else 0,
+            "comment": rng.choice(self.comments) if self.comments else 0,
+            "file": rng.choice(self.files) if self.files else 0,
+            "word": rng.choice(WORDS),
+            "title": _sentence(rng, 2, 6).capitalize(),
+            "status": rng.choice(["todo", "in_progress", "done"]),
+            "today": today,
+            "next_month": today + timedelta(days=30),
+            "access": self.access,
+            "refresh": self.refresh,
+        }
+
+    def forget_cached(self):
+        """
+        Drops the memberships and unread counts cached for the seeded
+        users and bumps the content versions of their workspaces, which
+        leaves their cached responses unreachable. Nothing else in a
+        shared cache is touched.
+        """
+        user_ids = [user.pk for user in self.users]
+        invalidate_workspace_ids(user_ids)
+        invalidate_unread_counts(user_ids)
+        bump_content_versions(self.workspaces)
+
+    def cleanup(self):
+        """
+        Forgets what was cached about the seeded rows once they are rolled
+        back, their ids may be reused, and deletes the seeded blob if
+        nothing else points at it.
+        """
+        self.forget_cached()
+        if self.blob and not TaskFile.objects.filter(file=self.blob).exists():
+            get_task_file_storage().delete(self.blob)
+
+
+def _format(value, context):
+    if isinstance(value, str):
+        # A lone placeholder keeps the type of its value, e.g. an id.
+        if value[:1] == "{" and value[-1:] == "}" and value[1:-1] in context:
+            return context[value[1:-1]]
+        return value.format_map(context)
+    if isinstance(value, list):
+        return [_format(item, context) for item in value]
+    if isinstance(value, dict):
+        return {key: _format(item, context) for key, item in value.items()}
+    return value
+
+
+def read_log(lines):
+    """
+    Parses a recorded request log: one JSON object per line with
+    ``method``, ``path`` and optionally ``body`` and ``name``. Paths and
+    bodies may use the placeholders of ``Dataset.context()``.
+    """
+    for line in lines:
+        if line.strip():
+            record = json.loads(line)
+            yield (
+                record.get("name"),
+                record.get("method", "GET").upper(),
+                record["path"],
+                record.get("body"),
+            )
+
+
+def _host():
+    # The test client's "testserver" is only allowed by test runs.
+    for host in settings.ALLOWED_HOSTS:
+        if host != "*" and not host.startswith("."):
+            return host
+    return "testserver"
+
+
+class Runner:
+    """
+    Sends requests through the whole middleware and URL stack as
+    ``dataset.users[0]``, timing them and counting their queries.
+    """
+
+    def __init__(self, dataset, cold=False):
+        self.dataset = dataset
+        self.cold = cold
+        self.client = Client(
+            HTTP_HOST=_host(),
+            headers={"Authorization": f"Bearer {dataset.access}"},
+        )
+        self.count = 0
+
+    def request(self, method, path, body):
+        context = self.dataset.context(self.count)
+        self.count += 1
+        if callable(body):
+            body = body(context)
+        path, body = _format(path, context), _format(body, context)
+        if self.cold:
+            self.dataset.forget_cached()
+
+        with CaptureQueriesContext(connection) as queries:
+            started = perf_counter()
+            # The on_commit() work of writes is done within the request.
+            with TestCase.captureOnCommitCallbacks(execute=True):
+                response = self.client.generic(
+                    method,
+                    path,
+                    json.dumps(body) if body is not None else "",
+                    content_type="application/json",
+                )
+                if response.streaming:
+                    for _ in response.streaming_content:
+                        pass
+            elapsed = perf_counter() - started
+        return path, response.status_code, elapsed, len(queries)
+
+
+def request_name(method, path):
+    try:
+        view_name = resolve(path.split("?")[0]).view_name
+    except Resolver404:
+        view_name = path.split("?")[0]
+    return f"{method} {view_name}"
+
+
+def _percentile(values, percent):
+    return values[max(math.ceil(len(values) * percent / 100) - 1, 0)]
+
+
+def summarize(samples):
+    """Aggregates ``(seconds, queries, status)`` samples."""
+    latencies = sorted(seconds for seconds, _, _ in samples)
+    queries = [count for _, count, _ in samples]
+    total = sum(latencies)
+    return {
+        "requests": len(samples),
+        "p50": round(_percentile(latencies, 50) * 1000, 2),
+        "p95": round(_percentile(latencies, 95) * 1000, 2),
+        "p99": round(_percentile(latencies, 99) * 1000, 2),
+        "max": round(latencies[-1] * 1000, 2),
+        "rps": round(len(samples) / total, 1) if total else None,
+        "queries": round(sum(queries) / len(queries), 1),
+        "max_queries": max(queries),
+        "errors": sum(status >= 400 for _, _, status in samples),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    Returns ``(name, metric, baseline, current)`` for every result whose
+    p95 grew by more than ``tolerance`` or that runs more queries.
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result["p95"] > base["p95"] * (1 + tolerance):
+            regressions.append((name, "p95", base["p95"], result["p95"]))
+        if result["max_queries"] > base["max_queries"]:
+            regressions.append(
+                (
+                    name,
+                    "max_queries",
+                    base["max_queries"],
+                    result["max_queries"],
+                )
+            )
+    return regressions
@@ -0,0 +1,154 @@
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from task_manager.cache import bump_content_versions
+from task_manager.models import Comment, Task, Tombstone
+from task_manager.realtime import publish_events, workspace_channel
+from task_manager.search import get_search_backend
+from task_manager.serializers import TaskSummarySerializer
+from task_manager.tasks import schedule_deadline_reminder
+
+
+BULK_MAX_TASKS = 500
+TASK_FIELDS = ["title", "description", "deadline", "priority", "status"]
+
+
+def _set_assignees(assignees):
+    """Replaces the assignees of the tasks in ``{task_id: user_ids}``."""
+    if not assignees:
+        return
+    Through = Task.assignees.through
+    Through.objects.filter(task_id__in=assignees).delete()
+    Through.objects.bulk_create(
+        [
+            Through(task_id=task_id, user_id=user_id)
+            for task_id, user_ids in assignees.items()
+            for user_id in set(user_ids)
+        ]
+    )
+
+
+def _after_write(tasks, created, moved=(), rescheduled=()):
+    """
+    Does what the Task signals do for single writes, which bulk_create
+    and bulk_update don't send. Returns the tasks reloaded with their
+    assignees, in the same order.
+    """
+    backend = get_search_backend()
+    backend.index_tasks(tasks)
+    if moved:
+        Tombstone.objects.bulk_create(
+            [
+                Tombstone(
+                    workspace_id=task._previous_workspace_id,
+                    kind="task",
+                    object_id=task.pk,
+                )
+                for task in moved
+            ]
+        )
+        comments = Comment.objects.filter(task__in=moved)
+        comments.update(updated_at=timezone.now())
+        backend.index_comments(comments.select_related("task"))
+
+    reloaded = Task.objects.prefetch_related("assignees").in_bulk(
+        [task.pk for task in tasks]
+    )
+    tasks = [reloaded[task.pk] for task in tasks]
+
+    workspace_ids = {task.workspace_id for task in tasks}
+    workspace_ids.update(task._previous_workspace_id for task in moved)
+    transaction.on_commit(partial(bump_content_versions, workspace_ids))
+
+    event_type = "task.created" if created else "task.updated"
+    publish_events(
+        (
+            workspace_channel(task.workspace_id),
+            event_type,
+            TaskSummarySerializer(task).data,
+        )
+        for task in tasks
+    )
+
+    if settings.DEADLINE_REMINDERS_MODE == "eta":
+        for task in tasks:
+            if task.pk in rescheduled:
+                transaction.on_commit(
+                    partial(schedule_deadline_reminder, task)
+                )
+    return tasks
+
+
+def create_tasks(items, creator):
+    """
+    Inserts the validated ``items`` of a TaskBulkCreateSerializer and
+    their assignees with one bulk insert each, in one transaction.
+    """
+    with transaction.atomic():
+        tasks = Task.objects.bulk_create(
+            [
+                Task(
+                    workspace_id=item["workspace"],
+                    creator=creator,
+                    **{
+                        field: item[field]
+                        for field in TASK_FIELDS
+                        if field in item
+                    },
+                )
+                for item in items
+            ]
+        )
+        _set_assignees(
+            {
+                task.pk: item["assignee_ids"]
+                for task, item in zip(tasks, items)
+                if item["assignee_ids"]
+            }
+        )
+        return _after_write(
+            tasks,
+            created=True,
+            rescheduled={task.pk for task in tasks if task.deadline},
+        )
+
+
+def update_tasks(items):
+    """
+    Applies the validated ``items`` of a TaskBulkUpdateSerializer with
+    one bulk update, and replaces the assignees of the items that have
+    ``assignee_ids`` with one delete and one insert.
+    """
+    now = timezone.now()
+    tasks, fields, moved, rescheduled = [], {"updated_at"}, [], set()
+    for item in items:
+        task = item["instance"]
+        for field in TASK_FIELDS:
+            if field in item:
+                setattr(task, field, item[field])
+                fields.add(field)
+        if "workspace" in item and item["workspace"] != task.workspace_id:
+            task._previous_workspace_id = task.workspace_id
+            task.workspace_id = item["workspace"]
+            fields.add("workspace")
+            moved.append(task)
+        if "deadline" in item or "status" in item:
+            rescheduled.add(task.pk)
+        task.updated_at = now
+        tasks.append(task)
+
+    with transaction.atomic():
+        Task.objects.bulk_update(tasks, fields, batch_size=BULK_MAX_TASKS)
+        _set_assignees(
+            {
+                item["id"]: item["assignee_ids"]
+                for item in items
+                if "assignee_ids" in item
+            }
+        )
+        return _after_write(
+            tasks, created=False, moved=moved, rescheduled=rescheduled
+        )
@@ -0,0 +1,179 @@
+import atexit
+import hashlib
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+
+from task_manager.models import Notification, Workspace
+
+
+UNREAD_COUNT_TIMEOUT = 60 * 5
+MEMBERSHIP_TIMEOUT = 60 * 60
+
+_registered_pid = None
+_other_process_seen = False
+
+
+def _processes_dir():
+    # Processes sharing a database share a directory.
+    name = str(settings.DATABASES["default"]["NAME"])
+    digest = hashlib.md5(name.encode(), usedforsecurity=False).hexdigest()
+    return Path(tempfile.gettempdir()) / f"task-manager-{digest}"
+
+
+def _is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _unregister(path, pid=None):
+    # Forked children inherit the atexit handlers of their parent.
+    if pid is None or pid == os.getpid():
+        path.unlink(missing_ok=True)
+
+
+def _single_process():
+    """
+    Whether this is the only process on the host using the database.
+    Processes register in a temporary directory the first time they ask;
+    once another one is seen, this process' cache may have missed its
+    writes for good.
+    """
+    global _registered_pid, _other_process_seen
+    if _other_process_seen:
+        return False
+
+    directory = _processes_dir()
+    pid = os.getpid()
+    if _registered_pid != pid:
+        # Also true in a forked child.
+        directory.mkdir(exist_ok=True)
+        path = directory / str(pid)
+        path.touch()
+        atexit.register(_unregister, path, pid)
+        _registered_pid = pid
+
+    for entry in os.scandir(directory):
+        other = int(entry.name) if entry.name.isdigit() else None
+        if other == pid:
+            continue
+        if other is not None and _is_running(other):
+            _other_process_seen = True
+            return False
+        _unregister(Path(entry.path))
+    return True
+
+
+def cache_usable():
+    """
+    Whether memberships, unread counts, versions and responses can be
+    cached: the cache is shared by every process, or this process is the
+    only one running, e.g. a development server with a local cache.
+    """
+    return settings.CACHE_SHARED or _single_process()
+
+
+def _unread_count_key(user_id):
+    return f"notifications:unread:{user_id}"
+
+
+def get_unread_count(user_id):
+    key = _unread_count_key(user_id)
+    usable = cache_usable()
+    count = cache.get(key) if usable else None
+    if count is None:
+        count = Notification.objects.filter(
+            user_id=user_id, is_read=False
+        ).count()
+        if usable:
+            cache.set(key, count, UNREAD_COUNT_TIMEOUT)
+    return count
+
+
+def increment_unread_count(user_id):
+    try:
+        cache.incr(_unread_count_key(user_id))
+    except ValueError:
+        # Not cached yet; it will be counted on the next read.
+        pass
+
+
+def invalidate_unread_counts(user_ids):
+    cache.delete_many([_unread_count_key(user_id) for user_id in user_ids])
+
+
+def _workspace_ids_key(user_id):
+    return f"workspaces:member:{user_id}"
+
+
+def get_workspace_ids(user):
+    """
+    Returns the ids of the workspaces ``user`` is a member of. The set is
+    shared through the cache when ``cache_usable()``, and
+    memoized on the user object, so repeated checks within a request cost
+    nothing.
+    """
+    workspace_ids = getattr(user, "_workspace_ids", None)
+    if workspace_ids is None:
+        key = _workspace_ids_key(user.pk)
+        usable = cache_usable()
+        workspace_ids = cache.get(key) if usable else None
+        if workspace_ids is None:
+            workspace_ids = frozenset(
+                Workspace.members.through.objects.filter(
+                    user_id=user.pk
+                ).values_list("workspace_id", flat=True)
+            )
+            if usable:
+                cache.set(key, workspace_ids, MEMBERSHIP_TIMEOUT)
+        user._workspace_ids = workspace_ids
+    return workspace_ids
+
+
+def is_workspace_member(user, workspace_id):
+    return workspace_id in get_workspace_ids(user)
+
+
+def invalidate_workspace_ids(user_ids):
+    cache.delete_many([_workspace_ids_key(user_id) for user_id in user_ids])
+
+
+def _get_versions(prefix, workspace_ids):
+    if not cache_usable():
+        # Another process may have bumped them: nothing matches.
+        now = time.time_ns()
+        return {pk: now for pk in workspace_ids}
+    keys = {f"{prefix}:{pk}": pk for pk in workspace_ids}
+    versions = cache.get_many(keys)
+    # A version missing from the cache is simply replaced by a new one.
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def _bump_versions(prefix, workspace_ids):
+    now = time.time_ns()
+    cache.set_many({f"{prefix}:{pk}": now for pk in workspace_ids}, None)
+
+
+def get_content_versions(workspace_ids):
+    """
+    Returns opaque versions of the content of the given workspaces,
+    changed by any write to their tasks, comments, files or members.
+    """
+    return _get_versions("workspaces:content-version", workspace_ids)
+
+
+def bump_content_versions(workspace_ids):
+    _bump_versions("workspaces:content-version", workspace_ids)
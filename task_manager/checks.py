@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    if settings.CACHE_SHARED:
+        return []
+    return [
+        Error(
+            "The cache isn't shared by the web and worker processes.",
+            hint=(
+                "Set CACHE_URL_ENV to a Redis server. Without it memberships,"
+                " unread counts and responses aren't cached once several"
+                " processes run, and metrics only cover one process."
+            ),
+            id="task_manager.E001",
+        )
+    ]
+
+
+@register(deploy=True)
+def check_metrics_token(app_configs, **kwargs):
+    if settings.METRICS_TOKEN:
+        return []
+    return [
+        Warning(
+            "/metrics is disabled without a token.",
+            hint="Set METRICS_TOKEN_ENV to serve it to a bearer token.",
+            id="task_manager.W001",
+        )
+    ]
@@ -0,0 +1,124 @@
+import hashlib
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, quote_etag
+
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def parse_range(header, size):
+    """
+    Returns the inclusive ``(start, end)`` of a single byte range, or
+    ``None`` when the header is absent or asks for several ranges, in
+    which case the whole file is served. Raises ``ValueError`` when the
+    range can't be satisfied.
+    """
+    match = RANGE_RE.match(header or "")
+    if match is None:
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+
+    if start > end or start >= size:
+        raise ValueError(header)
+    return start, end
+
+
+def _stream_range(fh, start, length):
+    try:
+        fh.seek(start)
+        while length > 0:
+            chunk = fh.read(min(STREAM_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        fh.close()
+
+
+def _handoff_response(name, storage):
+    # The front-end server streams the file and handles Range itself.
+    response = HttpResponse()
+    if settings.FILE_DOWNLOAD_BACKEND == "x-accel":
+        response["X-Accel-Redirect"] = (
+            settings.FILE_DOWNLOAD_ACCEL_PREFIX + name
+        )
+    else:
+        response["X-Sendfile"] = storage.path(name)
+    del response["Content-Type"]
+    return response
+
+
+def serve_file(request, field_file, filename=None, as_attachment=True):
+    """
+    Serves ``field_file`` honouring ``If-None-Match``/``If-Modified-Since``
+    and single byte ranges. Depending on ``FILE_DOWNLOAD_BACKEND`` the
+    bytes are sent by Django (``wsgi.file_wrapper``/sendfile when the
+    server supports it) or handed off to the front-end server.
+    """
+    storage, name = field_file.storage, field_file.name
+    filename = filename or os.path.basename(name)
+    size = storage.size(name)
+    last_modified = int(storage.get_modified_time(name).timestamp())
+    etag = quote_etag(
+        hashlib.md5(
+            f"{name}:{size}:{last_modified}".encode(), usedforsecurity=False
+        ).hexdigest()
+    )
+
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is not None:
+        return response
+
+    if settings.FILE_DOWNLOAD_BACKEND in ("x-accel", "x-sendfile"):
+        response = _handoff_response(name, storage)
+    else:
+        try:
+            byte_range = parse_range(request.META.get("HTTP_RANGE"), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+
+        # A stale If-Range means the client's partial copy is outdated.
+        if_range = request.META.get("HTTP_IF_RANGE")
+        if if_range and if_range not in (etag, http_date(last_modified)):
+            byte_range = None
+
+        if byte_range is None:
+            response = FileResponse(field_file.open("rb"))
+        else:
+            start, end = byte_range
+            response = StreamingHttpResponse(
+                _stream_range(field_file.open("rb"), start, end - start + 1),
+                status=206,
+                content_type=mimetypes.guess_type(filename)[0]
+                or "application/octet-stream",
+            )
+            response["Content-Range"] = f"bytes {start}-{end}/{size}"
+            response["Content-Length"] = end - start + 1
+        response["Accept-Ranges"] = "bytes"
+
+    response["Content-Disposition"] = content_disposition_header(
+        as_attachment=as_attachment, filename=filename
+    )
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    return response
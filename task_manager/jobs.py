@@ -0,0 +1,155 @@
+import cProfile
+import logging
+import random
+import uuid
+from datetime import timedelta
+from functools import wraps
+from pathlib import Path
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from task_manager.metrics import QueryProbe, registry
+from task_manager.models import JobLock
+
+
+logger = logging.getLogger(__name__)
+
+# An exclusive job whose worker died releases its lock after this long.
+JOB_LOCK_TIMEOUT = 60 * 60
+
+
+def _items(result, kind):
+    """The counts in what a job returned: an int, or a dict of ints."""
+    if isinstance(result, bool):
+        return {}
+    if isinstance(result, int):
+        return {kind: result}
+    if isinstance(result, dict):
+        return {
+            key: value
+            for key, value in result.items()
+            if isinstance(value, int) and not isinstance(value, bool)
+        }
+    return {}
+
+
+def _acquire(name, run_id):
+    # A conditional update is atomic on every database, and the row is
+    # seen by every worker, whatever the cache.
+    now = timezone.now()
+    JobLock.objects.get_or_create(name=name, defaults={"expires_at": now})
+    return (
+        JobLock.objects.filter(name=name)
+        .filter(Q(run_id="") | Q(expires_at__lte=now))
+        .update(
+            run_id=run_id,
+            expires_at=now + timedelta(seconds=JOB_LOCK_TIMEOUT),
+        )
+        == 1
+    )
+
+
+def _release(name, run_id):
+    JobLock.objects.filter(name=name, run_id=run_id).update(run_id="")
+
+
+def _save_profile(profiler, name, run_id):
+    directory = Path(settings.JOB_PROFILE_DIR)
+    path = directory / f"{name}-{timezone.now():%Y%m%d%H%M%S}-{run_id}.prof"
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(path)
+    except OSError as e:
+        logger.warning(f"⚠️ {name} profile not saved: {e}")
+        return
+    logger.info(f"🔬 {name} profile saved to {path}")
+
+
+def instrumented(items="items", budget=None, exclusive=False):
+    """
+    Records the duration, queries and outcome of every run of the
+    decorated Celery task, and the items it processed: its int result,
+    counted as ``items``, or the ints of its dict result. Runs longer than
+    ``budget`` seconds are counted as overruns. An ``exclusive`` task is
+    skipped while a previous run still holds its lock. A
+    ``JOB_PROFILE_SAMPLE_RATE`` of runs are profiled to ``JOB_PROFILE_DIR``.
+    """
+
+    def decorator(func):
+        name = func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            run_id = uuid.uuid4().hex[:12]
+            labels = {"task": name}
+            if exclusive and not _acquire(name, run_id):
+                registry.inc(
+                    "celery_task_runs_total", {**labels, "outcome": "skipped"}
+                )
+                registry.maybe_publish(force=True)
+                logger.warning(f"⏭️ {name} skipped, a previous run is going")
+                return None
+
+            rate = settings.JOB_PROFILE_SAMPLE_RATE
+            profiler = (
+                cProfile.Profile() if rate and random.random() < rate else None
+            )
+            probe = QueryProbe()
+            outcome = "failure"
+            started = perf_counter()
+            try:
+                with connection.execute_wrapper(probe):
+                    if profiler is not None:
+                        profiler.enable()
+                    try:
+                        result = func(*args, **kwargs)
+                    finally:
+                        if profiler is not None:
+                            profiler.disable()
+                outcome = "success"
+            finally:
+                seconds = perf_counter() - started
+                if exclusive:
+                    _release(name, run_id)
+
+                registry.inc(
+                    "celery_task_runs_total", {**labels, "outcome": outcome}
+                )
+                registry.observe(
+                    "celery_task_duration_seconds", labels, seconds
+                )
+                registry.observe("celery_task_db_queries", labels, probe.count)
+                registry.observe(
+                    "celery_task_db_duration_seconds", labels, probe.seconds
+                )
+                if budget is not None and seconds > budget:
+                    registry.inc("celery_task_overruns_total", labels)
+                    logger.warning(
+                        f"🐢 {name} took {seconds:.1f}s, over its {budget}s "
+                        "budget"
+                    )
+                if outcome == "success":
+                    for kind, count in _items(result, items).items():
+                        registry.inc(
+                            "celery_task_items_total",
+                            {**labels, "kind": kind},
+                            count,
+                        )
+                # Workers may idle for hours before the next run.
+                registry.maybe_publish(force=True)
+
+                logger.info(
+                    f"⏱️ {name} {outcome} in {seconds:.2f}s, "
+                    f"{probe.count} queries ({probe.seconds:.2f}s)"
+                )
+                if profiler is not None:
+                    _save_profile(profiler, name, run_id)
+            return result
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,208 @@
+import fnmatch
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from task_manager import benchmarks
+
+
+COLUMNS = ("requests", "p50", "p95", "p99", "max", "rps", "queries", "errors")
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds synthetic workspaces and measures the latency percentiles "
+        "(ms), sequential throughput and SQL queries of every endpoint, or "
+        "of the requests of a recorded log with --replay. Everything is "
+        "rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=20)
+        parser.add_argument("--workspaces", type=int, default=5)
+        parser.add_argument(
+            "--members", type=int, default=10, help="Members per workspace."
+        )
+        parser.add_argument(
+            "--tasks", type=int, default=200, help="Tasks per workspace."
+        )
+        parser.add_argument(
+            "--comments",
+            type=int,
+            default=3,
+            help="Average number of comments per task.",
+        )
+        parser.add_argument(
+            "--files",
+            type=int,
+            default=1,
+            help="Average number of files per task.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=50,
+            help="Requests per endpoint, or passes over the replayed log.",
+        )
+        parser.add_argument("--warmup", type=int, default=5)
+        parser.add_argument(
+            "--only",
+            action="append",
+            default=[],
+            help="Only run the endpoints matching this pattern, e.g. 'tasks.*'.",
+        )
+        parser.add_argument(
+            "--replay",
+            help=(
+                "JSON lines log of {method, path, body, name} requests, "
+                "which may use placeholders such as {workspace} or {task}."
+            ),
+        )
+        parser.add_argument(
+            "--cold",
+            action="store_true",
+            help=(
+                "Forget what is cached about the seeded data before every "
+                "request."
+            ),
+        )
+        parser.add_argument("--save-baseline", metavar="PATH")
+        parser.add_argument("--baseline", metavar="PATH")
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.25,
+            help="Allowed p95 growth over the baseline, 0.25 being 25%%.",
+        )
+
+    def handle(self, *args, **options):
+        requests = self.get_requests(options)
+        dataset = benchmarks.Dataset(
+            users=options["users"],
+            workspaces=options["workspaces"],
+            members=options["members"],
+            tasks=options["tasks"],
+            comments=options["comments"],
+            files=options["files"],
+            seed=options["seed"],
+        )
+
+        try:
+            with transaction.atomic():
+                started = time.perf_counter()
+                dataset.seed()
+                self.stdout.write(
+                    f"Seeded {len(dataset.users)} users, "
+                    f"{len(dataset.workspaces)} workspaces, "
+                    f"{len(dataset.tasks)} tasks, "
+                    f"{len(dataset.comments)} comments and "
+                    f"{len(dataset.files)} files in "
+                    f"{time.perf_counter() - started:.1f}s."
+                )
+                results = self.run(
+                    benchmarks.Runner(dataset, cold=options["cold"]),
+                    requests,
+                    options,
+                )
+                transaction.set_rollback(True)
+        finally:
+            dataset.cleanup()
+
+        self.report(results)
+
+        if options["save_baseline"]:
+            with open(options["save_baseline"], "w") as fh:
+                json.dump(
+                    {"scale": dataset.scale, "results": results}, fh, indent=2
+                )
+            self.stdout.write(f"Baseline saved to {options['save_baseline']}.")
+        if options["baseline"]:
+            self.check_baseline(options, dataset.scale, results)
+
+    def get_requests(self, options):
+        if options["replay"]:
+            with open(options["replay"]) as fh:
+                return list(benchmarks.read_log(fh))
+
+        requests = benchmarks.SCENARIOS
+        if options["only"]:
+            requests = [
+                request
+                for request in requests
+                if any(
+                    fnmatch.fnmatch(request[0], pattern)
+                    for pattern in options["only"]
+                )
+            ]
+        if not requests:
+            raise CommandError("No endpoint matches --only.")
+        return requests
+
+    def run(self, runner, requests, options):
+        samples = {}
+        if options["replay"]:
+            for _ in range(options["iterations"]):
+                for name, method, path, body in requests:
+                    path, status, seconds, queries = runner.request(
+                        method, path, body
+                    )
+                    name = name or benchmarks.request_name(method, path)
+                    samples.setdefault(name, []).append(
+                        (seconds, queries, status)
+                    )
+        else:
+            for name, method, path, body in requests:
+                for _ in range(options["warmup"]):
+                    runner.request(method, path, body)
+                samples[name] = []
+                for _ in range(options["iterations"]):
+                    _, status, seconds, queries = runner.request(
+                        method, path, body
+                    )
+                    samples[name].append((seconds, queries, status))
+        return {
+            name: benchmarks.summarize(values)
+            for name, values in samples.items()
+            if values
+        }
+
+    def report(self, results):
+        width = max(len(name) for name in results)
+        self.stdout.write(
+            "endpoint".ljust(width)
+            + "".join(column.rjust(10) for column in COLUMNS)
+        )
+        for name, result in results.items():
+            line = name.ljust(width) + "".join(
+                str(result[column]).rjust(10) for column in COLUMNS
+            )
+            if result["errors"]:
+                line = self.style.WARNING(line)
+            self.stdout.write(line)
+
+    def check_baseline(self, options, scale, results):
+        with open(options["baseline"]) as fh:
+            baseline = json.load(fh)
+        if baseline["scale"] != scale:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"The baseline was measured at another scale: "
+                    f"{baseline['scale']}."
+                )
+            )
+
+        regressions = benchmarks.compare(
+            results, baseline["results"], options["tolerance"]
+        )
+        for name, metric, before, after in regressions:
+            self.stdout.write(
+                self.style.ERROR(f"{name}: {metric} {before} -> {after}")
+            )
+        if regressions:
+            raise CommandError(
+                f"{len(regressions)} regressions against {options['baseline']}."
+            )
+        self.stdout.write(self.style.SUCCESS("No regressions."))
@@ -0,0 +1,87 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from task_manager.models import Workspace
+from task_manager.views import TaskViewSet
+
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares creating tasks one request at a time with "
+        "POST /api/tasks/bulk/. Everything is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tasks", type=int, default=500)
+        parser.add_argument("--batch-size", type=int, default=100)
+
+    def handle(self, *args, **options):
+        count, batch_size = options["tasks"], options["batch_size"]
+
+        with transaction.atomic():
+            user = User.objects.create_user(
+                username="benchmark-bulk-tasks", password=None
+            )
+            workspace = Workspace.objects.create(
+                name="benchmark", creator=user
+            )
+            workspace.members.add(user)
+
+            def payload(i):
+                return {
+                    "workspace": workspace.pk,
+                    "title": f"Task {i}",
+                    "priority": "medium",
+                    "assignee_ids": [user.pk],
+                }
+
+            factory = APIRequestFactory()
+            create = TaskViewSet.as_view({"post": "create"})
+            bulk = TaskViewSet.as_view({"post": "bulk"})
+
+            def run(view, path, data, expected):
+                request = factory.post(path, data, format="json")
+                force_authenticate(request, user=user)
+                response = view(request)
+                if response.status_code != expected:
+                    raise CommandError(
+                        f"{path} answered {response.status_code}: "
+                        f"{response.data}"
+                    )
+
+            started = time.perf_counter()
+            for i in range(count):
+                run(create, "/api/tasks/", payload(i), 201)
+            single = time.perf_counter() - started
+
+            started = time.perf_counter()
+            requests = 0
+            for start in range(0, count, batch_size):
+                data = [
+                    payload(i)
+                    for i in range(start, min(start + batch_size, count))
+                ]
+                run(bulk, "/api/tasks/bulk/", data, 201)
+                requests += 1
+            batched = time.perf_counter() - started
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(
+            f"per-task: {count} requests in {single:.2f}s, "
+            f"{count / single:.0f} req/s, {count / single:.0f} tasks/s"
+        )
+        self.stdout.write(
+            f"bulk:     {requests} requests in {batched:.2f}s, "
+            f"{requests / batched:.1f} req/s, {count / batched:.0f} tasks/s"
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"speed-up: {single / batched:.1f}x")
+        )
@@ -0,0 +1,31 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from task_manager.models import Workspace
+from task_manager.snapshots import WRITERS, export_records
+
+
+class Command(BaseCommand):
+    help = "Streams a workspace with its tasks, files and comments."
+
+    def add_arguments(self, parser):
+        parser.add_argument("workspace_id", type=int)
+        parser.add_argument("--format", choices=WRITERS, default="jsonl")
+        parser.add_argument(
+            "--output", help="File to write to, standard output by default."
+        )
+
+    def handle(self, *args, **options):
+        workspace = Workspace.objects.filter(
+            pk=options["workspace_id"]
+        ).first()
+        if workspace is None:
+            raise CommandError("Workspace not found.")
+
+        chunks = WRITERS[options["format"]](export_records(workspace))
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as fh:
+                fh.writelines(chunks)
+        else:
+            sys.stdout.writelines(chunks)
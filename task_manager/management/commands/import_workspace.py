@@ -0,0 +1,42 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from task_manager.snapshots import READERS, SnapshotError, import_records
+
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Restores an export of export_workspace into a new workspace."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--owner", required=True, help="Username.")
+        parser.add_argument("--format", choices=READERS)
+        parser.add_argument("--name", help="Name of the new workspace.")
+
+    def handle(self, *args, **options):
+        owner = User.objects.filter(username=options["owner"]).first()
+        if owner is None:
+            raise CommandError("Owner not found.")
+
+        path = options["path"]
+        file_format = options["format"] or (
+            "csv" if path.endswith(".csv") else "jsonl"
+        )
+        with open(path, encoding="utf-8", newline="") as fh:
+            try:
+                workspace, counts = import_records(
+                    READERS[file_format](fh), owner, name=options["name"]
+                )
+            except SnapshotError as e:
+                raise CommandError(f"Invalid export: {e}")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported workspace {workspace.pk}: {counts['tasks']} "
+                f"tasks, {counts['files']} files, {counts['comments']} "
+                f"comments ({counts['skipped']} skipped)."
+            )
+        )
@@ -0,0 +1,260 @@
+import bisect
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.core.cache import cache
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+PUBLISH_INTERVAL = 10
+# Snapshots outlive idle workers between daily jobs, and dead processes
+# for a while, so that summed counters don't go backwards.
+PROCESS_TIMEOUT = 60 * 60 * 24
+PROCESSES_KEY = "metrics:processes"
+IN_LIST = re.compile(r"IN \((?:%s, )*%s\)")
+
+logger = logging.getLogger(__name__)
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+JOB_SECONDS_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 900, 3600)
+JOB_QUERY_BUCKETS = (0, 10, 100, 1000, 10000, 100000)
+
+# name: (type, help, histogram buckets)
+METRICS = {
+    "http_requests_total": (
+        "counter",
+        "Requests by view, method and status.",
+        None,
+    ),
+    "http_request_duration_seconds": (
+        "histogram",
+        "Time from the request reaching the app to its response.",
+        SECONDS_BUCKETS,
+    ),
+    "http_sampled_requests_total": (
+        "counter",
+        "Requests whose queries and serialization were measured.",
+        None,
+    ),
+    "http_db_queries": (
+        "histogram",
+        "SQL queries run by a sampled request.",
+        QUERY_BUCKETS,
+    ),
+    "http_db_duration_seconds": (
+        "histogram",
+        "Time a sampled request spent running SQL queries.",
+        SECONDS_BUCKETS,
+    ),
+    "http_serialization_duration_seconds": (
+        "histogram",
+        "Time a sampled request spent outside the database from its view "
+        "being called to its response being rendered.",
+        SECONDS_BUCKETS,
+    ),
+    "http_repeated_queries_total": (
+        "counter",
+        "Sampled requests that ran the same query shape too many times.",
+        None,
+    ),
+    "celery_task_runs_total": (
+        "counter",
+        "Celery task runs by outcome: success, failure or skipped.",
+        None,
+    ),
+    "celery_task_duration_seconds": (
+        "histogram",
+        "Duration of Celery task runs.",
+        JOB_SECONDS_BUCKETS,
+    ),
+    "celery_task_db_queries": (
+        "histogram",
+        "SQL queries run by a Celery task run.",
+        JOB_QUERY_BUCKETS,
+    ),
+    "celery_task_db_duration_seconds": (
+        "histogram",
+        "Time a Celery task run spent running SQL queries.",
+        JOB_SECONDS_BUCKETS,
+    ),
+    "celery_task_items_total": (
+        "counter",
+        "Items processed by Celery tasks, by kind.",
+        None,
+    ),
+    "celery_task_overruns_total": (
+        "counter",
+        "Celery task runs that took longer than their budget.",
+        None,
+    ),
+}
+
+
+class QueryProbe:
+    """Database execute wrapper counting and timing the queries run."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+            # Lookups of different lengths still have the same shape.
+            self.shapes[IN_LIST.sub("IN (...)", sql)] += 1
+
+
+class Registry:
+    """
+    The metrics of this process. Every ``PUBLISH_INTERVAL`` seconds a
+    snapshot is stored in the cache, where ``collect()`` sums the
+    snapshots of all processes.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.pid = os.getpid()
+        self.id = uuid.uuid4().hex
+        self.values = {}
+        self.published_at = time.monotonic()
+
+    def _check_fork(self):
+        if os.getpid() != self.pid:
+            # A forked worker doesn't carry on the counts of its parent.
+            self.reset()
+
+    def inc(self, name, labels, amount=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self._check_fork()
+            self.values[key] = self.values.get(key, 0) + amount
+        self.maybe_publish()
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self._check_fork()
+            histogram = self.values.get(key)
+            if histogram is None:
+                # One count per bucket and one above them, then the sum.
+                histogram = self.values[key] = [0] * (len(buckets) + 2)
+            histogram[bisect.bisect_left(buckets, value)] += 1
+            histogram[-1] += value
+        self.maybe_publish()
+
+    def maybe_publish(self, force=False):
+        if force or time.monotonic() - self.published_at >= PUBLISH_INTERVAL:
+            try:
+                self.publish()
+            except Exception as e:
+                # Metrics must never fail the request or job they measure.
+                logger.warning(f"⚠️ Metrics not published: {e}")
+
+    def publish(self):
+        with self.lock:
+            self._check_fork()
+            self.published_at = time.monotonic()
+            snapshot = {
+                key: list(value) if isinstance(value, list) else value
+                for key, value in self.values.items()
+            }
+        cache.set(f"metrics:process:{self.id}", snapshot, PROCESS_TIMEOUT)
+        processes = cache.get(PROCESSES_KEY) or set()
+        if self.id not in processes:
+            cache.set(PROCESSES_KEY, processes | {self.id}, None)
+
+
+registry = Registry()
+
+
+def collect():
+    """Sums the latest snapshots of every live process."""
+    registry.publish()
+    processes = cache.get(PROCESSES_KEY) or set()
+    snapshots = cache.get_many(
+        [f"metrics:process:{process}" for process in processes]
+    )
+    if len(snapshots) < len(processes):
+        # Processes that stopped publishing are forgotten.
+        cache.set(
+            PROCESSES_KEY,
+            {key.rsplit(":", 1)[1] for key in snapshots},
+            None,
+        )
+
+    merged = {}
+    for snapshot in snapshots.values():
+        for key, value in snapshot.items():
+            if key[0] not in METRICS:
+                continue
+            if isinstance(value, list):
+                total = merged.setdefault(key, [0] * len(value))
+                for i, item in enumerate(value):
+                    total[i] += item
+            else:
+                merged[key] = merged.get(key, 0) + value
+    return merged
+
+
+def _labels(labels, **extra):
+    labels = [*labels, *extra.items()]
+    if not labels:
+        return ""
+    escaped = (
+        (
+            name,
+            str(value)
+            .replace("\\", r"\\")
+            .replace('"', r"\"")
+            .replace("\n", r"\n"),
+        )
+        for name, value in labels
+    )
+    pairs = ",".join(f'{name}="{value}"' for name, value in escaped)
+    return "{" + pairs + "}"
+
+
+def render(values):
+    """Formats ``collect()`` in the Prometheus text exposition format."""
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        series = sorted(
+            (
+                (labels, value)
+                for (metric, labels), value in values.items()
+                if metric == name
+            ),
+            key=lambda item: item[0],
+        )
+        if not series:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in series:
+            if kind == "counter":
+                lines.append(f"{name}{_labels(labels)} {value}")
+                continue
+            count = 0
+            for bound, bucket in zip((*buckets, "+Inf"), value):
+                count += bucket
+                lines.append(
+                    f"{name}_bucket{_labels(labels, le=bound)} {count}"
+                )
+            lines.append(f"{name}_sum{_labels(labels)} {value[-1]}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+    return "\n".join(lines) + "\n"
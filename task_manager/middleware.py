@@ -0,0 +1,145 @@
+import logging
+import random
+from functools import cache
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connection
+
+from task_manager.metrics import QueryProbe, registry
+
+
+logger = logging.getLogger(__name__)
+
+
+def view_name(request):
+    """``TaskViewSet.list``, ``search_view``... or ``unresolved``."""
+    match = request.resolver_match
+    if match is None:
+        return "unresolved"
+    cls = getattr(match.func, "cls", None)
+    if cls is None:
+        return getattr(match.func, "__name__", match.view_name)
+    action = getattr(match.func, "actions", {}).get(request.method.lower())
+    return f"{cls.__name__}.{action}" if action else cls.__name__
+
+
+@cache
+def _warn_cache_not_shared():
+    # Once per process, though every handler builds its own middleware.
+    logger.warning(
+        "⚠️ The cache isn't shared, /metrics only shows the process "
+        "answering it"
+    )
+
+
+class RequestProbe(QueryProbe):
+    """Also times the view and the rendering of its response."""
+
+    def __init__(self):
+        super().__init__()
+        self.view_started = None
+        self.view_db_seconds = 0.0
+        self.rendered = None
+
+    def view_called(self):
+        self.view_started = perf_counter()
+        self.view_db_seconds = self.seconds
+
+    def response_rendered(self, response):
+        self.rendered = perf_counter()
+
+
+class MetricsMiddleware:
+    """
+    Counts and times every request by view. ``METRICS_SAMPLE_RATE`` of
+    them also record their queries, database and serialization time, and
+    flag query shapes repeated ``METRICS_REPEATED_QUERY_THRESHOLD``
+    times. Async views are only counted and timed: their queries run in
+    other threads, with other connections.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.METRICS_SAMPLE_RATE
+        self.threshold = settings.METRICS_REPEATED_QUERY_THRESHOLD
+        if not settings.CACHE_SHARED:
+            _warn_cache_not_shared()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        started = perf_counter()
+        if self.sample_rate and random.random() < self.sample_rate:
+            request._query_probe = probe = RequestProbe()
+            with connection.execute_wrapper(probe):
+                response = self.get_response(request)
+            self.record_sample(request, probe)
+        else:
+            response = self.get_response(request)
+        self.record(request, response, perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        started = perf_counter()
+        response = await self.get_response(request)
+        self.record(request, response, perf_counter() - started)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        probe = getattr(request, "_query_probe", None)
+        if probe is not None:
+            probe.view_called()
+
+    def process_template_response(self, request, response):
+        probe = getattr(request, "_query_probe", None)
+        if probe is not None:
+            response.add_post_render_callback(probe.response_rendered)
+        return response
+
+    def record(self, request, response, seconds):
+        view = view_name(request)
+        registry.inc(
+            "http_requests_total",
+            {
+                "view": view,
+                "method": request.method,
+                "status": response.status_code,
+            },
+        )
+        registry.observe(
+            "http_request_duration_seconds", {"view": view}, seconds
+        )
+
+    def record_sample(self, request, probe):
+        labels = {"view": view_name(request)}
+        registry.inc("http_sampled_requests_total", labels)
+        registry.observe("http_db_queries", labels, probe.count)
+        registry.observe("http_db_duration_seconds", labels, probe.seconds)
+        if probe.view_started is not None:
+            # From the view being called to the response being rendered,
+            # less the queries run meanwhile.
+            serialization = (
+                (probe.rendered or perf_counter())
+                - probe.view_started
+                - (probe.seconds - probe.view_db_seconds)
+            )
+            registry.observe(
+                "http_serialization_duration_seconds", labels, serialization
+            )
+
+        if probe.shapes:
+            shape, times = probe.shapes.most_common(1)[0]
+            if times >= self.threshold:
+                registry.inc("http_repeated_queries_total", labels)
+                logger.warning(
+                    f"⚠️ {labels['view']} ran the same query {times} "
+                    f"times: {shape[:200]}"
+                )
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.2 on 2026-10-18 13:18
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_notifications(apps, schema_editor):
+    Notification = apps.get_model("task_manager", "Notification")
+    duplicates = (
+        Notification.objects.filter(task__isnull=False)
+        .values("user", "task")
+        .annotate(keep_id=Min("id"), total=Count("id"))
+        .filter(total__gt=1)
+    )
+    for row in list(duplicates):
+        Notification.objects.filter(
+            user=row["user"], task=row["task"]
+        ).exclude(id=row["keep_id"]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("task_manager", "0004_created_at_cursor_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            remove_duplicate_notifications, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name="notification",
+            constraint=models.UniqueConstraint(
+                fields=("user", "task"), name="unique_notification_user_task"
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.2 on 2026-10-18 13:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("task_manager", "0006_jobwatermark_task_deadline_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="task",
+            name="reminder_task_id",
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.2 on 2026-10-18 13:25
+
+import os
+
+import task_manager.storage
+from django.db import migrations, models
+
+
+def backfill_names(apps, schema_editor):
+    TaskFile = apps.get_model("task_manager", "TaskFile")
+    for task_file in TaskFile.objects.filter(name="").iterator():
+        task_file.name = os.path.basename(task_file.file.name)
+        task_file.save(update_fields=["name"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("task_manager", "0009_uploadsession"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="taskfile",
+            name="name",
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name="taskfile",
+            name="file",
+            field=models.FileField(
+                db_index=True,
+                max_length=255,
+                storage=task_manager.storage.get_task_file_storage,
+                upload_to="task_files/",
+            ),
+        ),
+        migrations.RunPython(backfill_names, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.2 on 2026-10-18 13:26
+
+import task_manager.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("task_manager", "0010_taskfile_content_addressed"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="taskfile",
+            name="thumbnail",
+            field=models.FileField(
+                blank=True,
+                db_index=True,
+                max_length=255,
+                storage=task_manager.storage.get_task_file_storage,
+                upload_to="task_files/thumbnails/",
+            ),
+        ),
+    ]
@@ -0,0 +1,50 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE task_manager_search USING fts5("
+            "scope, title, body, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            "INSERT INTO task_manager_search (rowid, scope, title, body) "
+            "SELECT 2 * id, 'w' || workspace_id, title, description "
+            "FROM task_manager_task"
+        )
+        schema_editor.execute(
+            "INSERT INTO task_manager_search (rowid, scope, title, body) "
+            "SELECT 2 * c.id + 1, 'w' || t.workspace_id, '', c.text "
+            "FROM task_manager_comment c "
+            "JOIN task_manager_task t ON t.id = c.task_id"
+        )
+    elif vendor == "postgresql":
+        schema_editor.execute(
+            "CREATE INDEX task_search_idx ON task_manager_task USING gin "
+            "(to_tsvector('simple', title || ' ' || description))"
+        )
+        schema_editor.execute(
+            "CREATE INDEX comment_search_idx ON task_manager_comment "
+            "USING gin (to_tsvector('simple', text))"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute("DROP TABLE IF EXISTS task_manager_search")
+    elif vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS task_search_idx")
+        schema_editor.execute("DROP INDEX IF EXISTS comment_search_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("task_manager", "0012_sync_changes"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
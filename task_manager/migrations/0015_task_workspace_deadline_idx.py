@@ -0,0 +1,22 @@
+# Generated by Django 5.2.2 on 2026-10-18 13:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("task_manager", "0014_task_filter_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(
+                fields=["workspace", "deadline"],
+                name="task_workspace_deadline_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.2 on 2026-10-18 14:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("task_manager", "0016_tombstone_workspace_no_constraint"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="JobLock",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=100, unique=True)),
+                ("run_id", models.CharField(blank=True, max_length=32)),
+                ("expires_at", models.DateTimeField()),
+            ],
+        ),
+    ]
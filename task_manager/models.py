@@ -1,6 +1,10 @@
+import uuid
+
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from task_manager.storage import get_task_file_storage
+
 
 User = get_user_model()
 
@@ -57,18 +61,73 @@ class Task(models.Model):
     assignees = models.ManyToManyField(
         User, related_name="assigned_tasks", null=True
     )
+    reminder_task_id = models.CharField(max_length=255, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["workspace", "created_at", "id"],
+                name="task_workspace_created_idx",
+            ),
+            # Lists across all of a user's workspaces.
+            models.Index(fields=["created_at", "id"], name="task_created_idx"),
+            models.Index(fields=["deadline"], name="task_deadline_idx"),
+            models.Index(
+                fields=["workspace", "updated_at"],
+                name="task_workspace_updated_idx",
+            ),
+            models.Index(
+                fields=["workspace", "status", "deadline"],
+                name="task_workspace_status_idx",
+            ),
+            models.Index(
+                fields=["workspace", "priority"],
+                name="task_workspace_priority_idx",
+            ),
+            models.Index(
+                fields=["workspace", "deadline"],
+                name="task_workspace_deadline_idx",
+            ),
+        ]
+
 
 class TaskFile(models.Model):
     task = models.ForeignKey(
         Task, on_delete=models.CASCADE, related_name="files"
     )
-    file = models.FileField(upload_to="task_files/")
+    file = models.FileField(
+        upload_to="task_files/",
+        storage=get_task_file_storage,
+        max_length=255,
+        db_index=True,
+    )
+    name = models.CharField(max_length=255, blank=True)
+    thumbnail = models.FileField(
+        upload_to="task_files/thumbnails/",
+        storage=get_task_file_storage,
+        max_length=255,
+        blank=True,
+        db_index=True,
+    )
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
 
+class UploadSession(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="upload_sessions"
+    )
+    task = models.ForeignKey(
+        Task, on_delete=models.CASCADE, related_name="upload_sessions"
+    )
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    sha256 = models.CharField(max_length=64)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
 class Comment(models.Model):
     task = models.ForeignKey(
         Task, on_delete=models.CASCADE, related_name="comments"
@@ -76,10 +135,27 @@ class Comment(models.Model):
     author = models.ForeignKey(User, on_delete=models.CASCADE)
     text = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     files = models.ManyToManyField(
         TaskFile, related_name="comments", blank=True
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["task", "created_at", "id"],
+                name="comment_task_created_idx",
+            ),
+            # Lists across tasks and workspaces.
+            models.Index(
+                fields=["created_at", "id"], name="comment_created_idx"
+            ),
+            models.Index(
+                fields=["task", "updated_at"],
+                name="comment_task_updated_idx",
+            ),
+        ]
+
 
 class Notification(models.Model):
     user = models.ForeignKey(
@@ -92,5 +168,85 @@ class Notification(models.Model):
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["user", "created_at", "id"],
+                name="notification_user_created_idx",
+            ),
+            models.Index(
+                fields=["user", "created_at"],
+                condition=models.Q(is_read=False),
+                name="notification_user_unread_idx",
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "task"],
+                name="unique_notification_user_task",
+            ),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.message[:40]}"
+
+
+class JobWatermark(models.Model):
+    """
+    High-water mark of an incremental scheduled job: ``horizon`` is the
+    furthest point the job has covered and ``scanned_at`` when it ran.
+    """
+
+    name = models.CharField(max_length=100, unique=True)
+    horizon = models.DateTimeField()
+    scanned_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} @ {self.horizon:%Y-%m-%d %H:%M}"
+
+
+class JobLock(models.Model):
+    """
+    Lease held by the running instance of an exclusive scheduled job,
+    free when ``run_id`` is empty or ``expires_at`` has passed.
+    """
+
+    name = models.CharField(max_length=100, unique=True)
+    run_id = models.CharField(max_length=32, blank=True)
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} ({self.run_id or 'free'})"
+
+
+class Tombstone(models.Model):
+    """
+    Deletion log read by the delta sync endpoint; rows older than
+    ``SYNC_TOMBSTONE_RETENTION_DAYS`` are purged.
+    """
+
+    KIND_CHOICES = [
+        ("task", "Task"),
+        ("comment", "Comment"),
+    ]
+
+    # No constraint: deleting a user cascades to their tasks, which log
+    # tombstones, and to their workspaces in the same transaction. The
+    # rows of deleted workspaces are purged with the others.
+    workspace = models.ForeignKey(
+        Workspace,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="tombstones",
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["workspace", "deleted_at"],
+                name="tombstone_workspace_idx",
+            ),
+        ]
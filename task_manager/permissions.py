@@ -1,6 +1,8 @@
 from rest_framework import permissions
 
+from task_manager.cache import is_workspace_member
+
 
 class IsWorkspaceMember(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
-        return request.user in obj.workspace.members.all()
+        return is_workspace_member(request.user, obj.workspace_id)
@@ -0,0 +1,154 @@
+import asyncio
+import json
+import threading
+from functools import lru_cache, partial
+
+import redis
+import redis.asyncio
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+
+HEARTBEAT_INTERVAL = 15
+
+
+def workspace_channel(workspace_id):
+    return f"workspace:{workspace_id}"
+
+
+def user_channel(user_id):
+    return f"user:{user_id}"
+
+
+class InProcessSubscription:
+    def __init__(self, broker, channel):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+
+    async def get(self, timeout):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    """
+    Delivers events to subscribers of the same process only; good enough
+    for a single ASGI worker or local development.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+
+    async def subscribe(self, channel):
+        subscription = InProcessSubscription(self, channel)
+        with self._lock:
+            self._subscriptions.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(
+                subscription.channel, set()
+            )
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self._subscriptions.pop(subscription.channel, None)
+
+    def publish_many(self, messages):
+        for channel, message in messages:
+            with self._lock:
+                subscriptions = list(self._subscriptions.get(channel, ()))
+            for subscription in subscriptions:
+                subscription.loop.call_soon_threadsafe(
+                    subscription.queue.put_nowait, message
+                )
+
+
+class RedisSubscription:
+    def __init__(self, client, pubsub):
+        self.client = client
+        self.pubsub = pubsub
+
+    async def get(self, timeout):
+        message = await self.pubsub.get_message(
+            ignore_subscribe_messages=True, timeout=timeout
+        )
+        return message["data"].decode() if message else None
+
+    async def close(self):
+        await self.pubsub.aclose()
+        await self.client.aclose()
+
+
+class RedisBroker:
+    """Fans events out through Redis pub/sub, across processes and hosts."""
+
+    def __init__(self, url):
+        self.url = url
+        self.client = redis.Redis.from_url(url)
+
+    async def subscribe(self, channel):
+        client = redis.asyncio.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        await pubsub.subscribe(channel)
+        return RedisSubscription(client, pubsub)
+
+    def publish_many(self, messages):
+        with self.client.pipeline(transaction=False) as pipe:
+            for channel, message in messages:
+                pipe.publish(channel, message)
+            pipe.execute()
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    if settings.REALTIME_BROKER_URL:
+        return RedisBroker(settings.REALTIME_BROKER_URL)
+    return InProcessBroker()
+
+
+def publish_events(events):
+    """
+    Publishes ``(channel, event_type, data)`` events once the current
+    transaction commits.
+    """
+    messages = [
+        (
+            channel,
+            json.dumps(
+                {"type": event_type, "data": data}, cls=DjangoJSONEncoder
+            ),
+        )
+        for channel, event_type, data in events
+    ]
+    if messages:
+        transaction.on_commit(partial(get_broker().publish_many, messages))
+
+
+def publish_event(channel, event_type, data):
+    publish_events([(channel, event_type, data)])
+
+
+async def event_stream(channel):
+    """Server-sent events for ``channel``, with periodic heartbeats."""
+    subscription = await get_broker().subscribe(channel)
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            message = await subscription.get(HEARTBEAT_INTERVAL)
+            if message is None:
+                yield ": keep-alive\n\n"
+                continue
+            event_type = json.loads(message)["type"]
+            yield f"event: {event_type}\ndata: {message}\n\n"
+    finally:
+        await subscription.close()
@@ -0,0 +1,48 @@
+import hashlib
+
+from django.core.cache import cache
+from rest_framework.response import Response
+
+from task_manager.cache import cache_usable, get_content_versions
+
+
+RESPONSE_CACHE_TIMEOUT = 60 * 10
+
+
+def cached_response(request, workspace_ids, render):
+    """
+    Serves the data of ``render()`` from the cache, keyed by the request
+    and the content versions of ``workspace_ids``. Writes bump the
+    versions, so entries are never stale, only unreachable until they
+    expire. The versions are read before rendering: a response computed
+    concurrently with a write is stored under the old version.
+
+    Only use it once the user is known to be a member of every
+    workspace, the cached data is shared between members.
+    """
+    if not cache_usable():
+        return render()
+
+    versions = get_content_versions(workspace_ids)
+    key = (
+        "responses:"
+        + hashlib.md5(
+            "|".join(
+                [
+                    request.get_host(),
+                    request.get_full_path(),
+                    repr(sorted(versions.items())),
+                ]
+            ).encode(),
+            usedforsecurity=False,
+        ).hexdigest()
+    )
+
+    data = cache.get(key)
+    if data is not None:
+        return Response(data)
+
+    response = render()
+    if response.status_code == 200:
+        cache.set(key, response.data, RESPONSE_CACHE_TIMEOUT)
+    return response
@@ -0,0 +1,243 @@
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.utils.module_loading import import_string
+
+from task_manager.models import Comment, Task
+
+
+SEARCH_TABLE = "task_manager_search"
+SNIPPET_TOKENS = 12
+TERM_RE = re.compile(r"\w+")
+
+
+def _terms(query):
+    return TERM_RE.findall(query)[:20]
+
+
+class SQLiteSearchBackend:
+    """
+    Keeps an FTS5 table in the same database, updated in the same
+    transaction as the rows it mirrors. Each row is scoped with a
+    ``w<workspace id>`` token so that restricting hits to workspaces is
+    answered by the full-text index too. The rowid encodes the row:
+    ``2 * id`` for tasks, ``2 * id + 1`` for comments.
+    """
+
+    # bm25() weights of the scope, title and body columns.
+    WEIGHTS = (0.0, 10.0, 1.0)
+
+    def index_tasks(self, tasks):
+        self._replace(
+            (2 * task.pk, task.workspace_id, task.title, task.description)
+            for task in tasks
+        )
+
+    def index_comments(self, comments):
+        self._replace(
+            (2 * comment.pk + 1, comment.task.workspace_id, "", comment.text)
+            for comment in comments
+        )
+
+    def remove(self, kind, ids):
+        offset = 0 if kind == "task" else 1
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s",
+                [(2 * pk + offset,) for pk in ids],
+            )
+
+    def rebuild(self, workspace_id=None):
+        """Reindexes everything, or only the workspace ``workspace_id``."""
+        where, params = "", []
+        with connection.cursor() as cursor:
+            if workspace_id is None:
+                cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+            else:
+                cursor.execute(
+                    f"DELETE FROM {SEARCH_TABLE} "
+                    f"WHERE {SEARCH_TABLE} MATCH %s",
+                    [f"scope : w{int(workspace_id)}"],
+                )
+                where, params = " WHERE t.workspace_id = %s", [workspace_id]
+            cursor.execute(
+                f"INSERT INTO {SEARCH_TABLE} (rowid, scope, title, body) "
+                "SELECT 2 * t.id, 'w' || t.workspace_id, t.title, "
+                "t.description FROM task_manager_task t" + where,
+                params,
+            )
+            cursor.execute(
+                f"INSERT INTO {SEARCH_TABLE} (rowid, scope, title, body) "
+                "SELECT 2 * c.id + 1, 'w' || t.workspace_id, '', c.text "
+                "FROM task_manager_comment c "
+                "JOIN task_manager_task t ON t.id = c.task_id" + where,
+                params,
+            )
+
+    def search(self, query, workspace_ids, limit, offset):
+        terms = _terms(query)
+        if not terms or not workspace_ids:
+            return []
+
+        words = " ".join(f'"{term}"' for term in terms) + "*"
+        scope = " OR ".join(f"w{pk}" for pk in sorted(workspace_ids))
+        match = f"scope : ({scope}) AND {{title body}} : ({words})"
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid, bm25({SEARCH_TABLE}, %s, %s, %s) AS rank, "
+                f"snippet({SEARCH_TABLE}, 2, '', '', '…', %s) "
+                f"FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s "
+                "ORDER BY rank LIMIT %s OFFSET %s",
+                [*self.WEIGHTS, SNIPPET_TOKENS, match, limit, offset],
+            )
+            rows = cursor.fetchall()
+        return [
+            {
+                "type": "comment" if rowid % 2 else "task",
+                "id": rowid // 2,
+                "rank": -rank,
+                "snippet": snippet,
+            }
+            for rowid, rank, snippet in rows
+        ]
+
+    def _replace(self, rows):
+        rows = [
+            (rowid, f"w{workspace_id}", title, body)
+            for rowid, workspace_id, title, body in rows
+        ]
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s",
+                [row[:1] for row in rows],
+            )
+            cursor.executemany(
+                f"INSERT INTO {SEARCH_TABLE} (rowid, scope, title, body) "
+                "VALUES (%s, %s, %s, %s)",
+                rows,
+            )
+
+
+class PostgresSearchBackend:
+    """
+    Queries the tables directly; the GIN indexes created by the
+    migration cover the same ``to_tsvector`` expressions, so there is
+    nothing to keep in sync.
+    """
+
+    CONFIG = "simple"
+
+    def index_tasks(self, tasks):
+        pass
+
+    def index_comments(self, comments):
+        pass
+
+    def remove(self, kind, ids):
+        pass
+
+    def rebuild(self, workspace_id=None):
+        pass
+
+    def search(self, query, workspace_ids, limit, offset):
+        terms = _terms(query)
+        if not terms or not workspace_ids:
+            return []
+
+        tsquery = " & ".join(terms) + ":*"
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "WITH q AS (SELECT to_tsquery(%(config)s, %(query)s) AS q), "
+                "hits AS ("
+                "  SELECT 'task' AS kind, t.id, t.description AS body,"
+                "    ts_rank_cd(setweight(to_tsvector(%(config)s, t.title), 'A')"
+                "      || to_tsvector(%(config)s, t.description), q.q) AS rank"
+                "  FROM task_manager_task t, q"
+                "  WHERE t.workspace_id = ANY(%(workspaces)s)"
+                "    AND to_tsvector(%(config)s, t.title || ' ' || t.description)"
+                "      @@ q.q"
+                "  UNION ALL"
+                "  SELECT 'comment', c.id, c.text,"
+                "    ts_rank_cd(to_tsvector(%(config)s, c.text), q.q)"
+                "  FROM task_manager_comment c"
+                "  JOIN task_manager_task t ON t.id = c.task_id, q"
+                "  WHERE t.workspace_id = ANY(%(workspaces)s)"
+                "    AND to_tsvector(%(config)s, c.text) @@ q.q"
+                "  ORDER BY rank DESC LIMIT %(limit)s OFFSET %(offset)s"
+                ") "
+                "SELECT kind, id, rank,"
+                "  ts_headline(%(config)s, body, q.q, %(headline)s) "
+                "FROM hits, q ORDER BY rank DESC",
+                {
+                    "config": self.CONFIG,
+                    "query": tsquery,
+                    "workspaces": sorted(workspace_ids),
+                    "limit": limit,
+                    "offset": offset,
+                    "headline": (
+                        'StartSel="", StopSel="", '
+                        f"MaxWords={SNIPPET_TOKENS}, MinWords=5"
+                    ),
+                },
+            )
+            rows = cursor.fetchall()
+        return [
+            {"type": kind, "id": pk, "rank": rank, "snippet": snippet}
+            for kind, pk, rank, snippet in rows
+        ]
+
+
+BACKENDS = {
+    "sqlite": SQLiteSearchBackend,
+    "postgresql": PostgresSearchBackend,
+}
+
+
+@lru_cache(maxsize=None)
+def get_search_backend():
+    if settings.SEARCH_BACKEND:
+        return import_string(settings.SEARCH_BACKEND)()
+    try:
+        return BACKENDS[connection.vendor]()
+    except KeyError:
+        raise ImproperlyConfigured(
+            f"No search backend for {connection.vendor}, set SEARCH_BACKEND."
+        )
+
+
+def search(query, workspace_ids, limit, offset=0):
+    """
+    Ranked task and comment hits for ``query`` in ``workspace_ids``, each
+    with the title and workspace of its task.
+    """
+    hits = get_search_backend().search(query, workspace_ids, limit, offset)
+
+    tasks = Task.objects.filter(
+        pk__in=[hit["id"] for hit in hits if hit["type"] == "task"]
+    ).values_list("pk", "pk", "workspace_id", "title")
+    comments = Comment.objects.filter(
+        pk__in=[hit["id"] for hit in hits if hit["type"] == "comment"]
+    ).values_list("pk", "task_id", "task__workspace_id", "task__title")
+    found = {
+        "task": {pk: row for pk, *row in tasks},
+        "comment": {pk: row for pk, *row in comments},
+    }
+
+    # Hits of rows deleted since they were indexed are skipped.
+    results = []
+    for hit in hits:
+        row = found[hit["type"]].get(hit["id"])
+        if row is not None:
+            task_id, workspace_id, title = row
+            results.append(
+                {
+                    **hit,
+                    "task": task_id,
+                    "workspace": workspace_id,
+                    "title": title,
+                }
+            )
+    return results
@@ -1,23 +1,94 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Prefetch, Q
+from django.utils import timezone
 from rest_framework import serializers
+from rest_framework.reverse import reverse
 
 from task_manager.models import (
     Comment,
     Notification,
     Task,
     TaskFile,
+    UploadSession,
     Workspace,
 )
+from task_manager.cache import get_workspace_ids, is_workspace_member
+from task_manager.tasks import ACTIVE_STATUSES
+from task_manager.uploads import received_parts
 from users.serializers import UserSerializer
 
 
 User = get_user_model()
 
 
+def _split_csv(value):
+    return [item.strip() for item in (value or "").split(",") if item.strip()]
+
+
+class DynamicFieldsMixin:
+    """
+    Trims the representation to ``?fields=a,b`` and leaves out
+    ``expandable_fields`` unless they are requested with ``?expand=a,b``.
+    Both can also be passed to the constructor as ``fields``/``expand``.
+    """
+
+    expandable_fields = ()
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        request = self.context.get("request")
+        if request is not None and request.method == "GET":
+            if fields is None:
+                fields = _split_csv(request.query_params.get("fields"))
+            if expand is None:
+                expand = _split_csv(request.query_params.get("expand"))
+
+        expand = set(expand or ())
+        for name in self.expandable_fields:
+            if name not in expand:
+                self.fields.pop(name, None)
+
+        if fields:
+            allowed = set(fields) | expand
+            for name in list(self.fields):
+                if name not in allowed:
+                    self.fields.pop(name)
+
+
 class TaskFileSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+    thumbnail_url = serializers.SerializerMethodField()
+
     class Meta:
         model = TaskFile
-        fields = ["id", "file", "uploaded_at"]
+        fields = [
+            "id",
+            "name",
+            "file",
+            "download_url",
+            "thumbnail_url",
+            "uploaded_at",
+        ]
+        read_only_fields = ["name"]
+
+    def get_thumbnail_url(self, obj):
+        if not obj.thumbnail:
+            return None
+        return reverse(
+            "files-thumbnail",
+            args=[obj.pk],
+            request=self.context.get("request"),
+        )
+
+    def get_download_url(self, obj):
+        return reverse(
+            "files-download",
+            args=[obj.pk],
+            request=self.context.get("request"),
+        )
 
 
 class CommentSerializer(serializers.ModelSerializer):
@@ -30,6 +101,13 @@ class CommentSerializer(serializers.ModelSerializer):
         write_only=True,
         required=False,
     )
+    file_ids = serializers.PrimaryKeyRelatedField(
+        many=True,
+        queryset=TaskFile.objects.all(),
+        write_only=True,
+        required=False,
+        help_text="Already uploaded files of the task to attach.",
+    )
 
     class Meta:
         model = Comment
@@ -38,24 +116,82 @@ class CommentSerializer(serializers.ModelSerializer):
             "author_name",
             "text",
             "created_at",
+            "updated_at",
             "task",
             "files",
             "uploaded_files",
+            "file_ids",
         ]
         read_only_fields = ["author"]
 
+    def validate(self, attrs):
+        task = attrs.get("task")
+        for task_file in attrs.get("file_ids", []):
+            if task is None or task_file.task_id != task.id:
+                raise serializers.ValidationError(
+                    {"file_ids": "Files must belong to the comment's task."}
+                )
+        return attrs
+
     def create(self, validated_data):
         uploaded_files = validated_data.pop("uploaded_files", [])
+        attached_files = validated_data.pop("file_ids", [])
         comment = Comment.objects.create(**validated_data)
 
         for file in uploaded_files:
-            task_file = TaskFile.objects.create(file=file, task=comment.task)
+            task_file = TaskFile.objects.create(
+                file=file, name=file.name, task=comment.task
+            )
             comment.files.add(task_file)
+        if attached_files:
+            comment.files.add(*attached_files)
 
         return comment
 
+    def setup_eager_loading(self, queryset):
+        queryset = queryset.select_related("author")
+        if "files" in self.fields:
+            queryset = queryset.prefetch_related("files")
+        return queryset
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    parts = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UploadSession
+        fields = ["id", "task", "filename", "size", "sha256", "parts"]
+
+    def get_parts(self, obj):
+        return received_parts(obj)
+
+    def validate_task(self, task):
+        if not is_workspace_member(
+            self.context["request"].user, task.workspace_id
+        ):
+            raise serializers.ValidationError(
+                "You are not a member of this task's workspace."
+            )
+        return task
+
+    def validate_size(self, value):
+        if not 0 < value <= settings.CHUNKED_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(
+                "Must be between 1 and "
+                f"{settings.CHUNKED_UPLOAD_MAX_SIZE} bytes."
+            )
+        return value
+
+    def validate_sha256(self, value):
+        value = value.lower()
+        if len(value) != 64 or any(c not in "0123456789abcdef" for c in value):
+            raise serializers.ValidationError(
+                "Must be a hex-encoded SHA-256 digest."
+            )
+        return value
+
 
-class TaskSerializer(serializers.ModelSerializer):
+class TaskSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     comments = CommentSerializer(many=True, read_only=True)
     files = TaskFileSerializer(many=True, read_only=True)
     assignees = UserSerializer(many=True, read_only=True)
@@ -85,6 +221,48 @@ class TaskSerializer(serializers.ModelSerializer):
             "files",
         ]
 
+    # The task and its assignees are saved in one transaction, so that
+    # subscribers get a single event.
+    @transaction.atomic
+    def create(self, validated_data):
+        return super().create(validated_data)
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        return super().update(instance, validated_data)
+
+    def setup_eager_loading(self, queryset):
+        """
+        Plans the joins and prefetches needed to render ``queryset`` with
+        the fields of this serializer, so that serializing a list costs a
+        fixed number of queries regardless of its length.
+        """
+        queryset = queryset.select_related("workspace", "creator")
+        if "assignees" in self.fields:
+            queryset = queryset.prefetch_related("assignees")
+        if "files" in self.fields:
+            queryset = queryset.prefetch_related("files")
+        if "comments" in self.fields:
+            comments = self.fields["comments"].child.setup_eager_loading(
+                Comment.objects.all()
+            )
+            queryset = queryset.prefetch_related(
+                Prefetch("comments", queryset=comments)
+            )
+        return queryset
+
+
+class TaskSummarySerializer(TaskSerializer):
+    """
+    Board card representation used by task lists: assignees are rendered
+    as ids and the description, comments and files are only included
+    when asked for with ``?expand=``.
+    """
+
+    assignees = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+
+    expandable_fields = ("description", "comments", "files")
+
 
 class WorkspaceSerializer(serializers.ModelSerializer):
     creator = serializers.HiddenField(default=serializers.CurrentUserDefault())
@@ -99,3 +277,169 @@ class NotificationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Notification
         fields = "__all__"
+
+
+class NotificationMarkReadSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False,
+        help_text="Notifications to mark as read; all unread if omitted.",
+    )
+
+
+class TaskFilterSerializer(serializers.Serializer):
+    """Validates the filters and ordering of the task list."""
+
+    ORDERING_CHOICES = [
+        "created_at",
+        "-created_at",
+        "updated_at",
+        "-updated_at",
+        "deadline",
+        "-deadline",
+    ]
+
+    status = serializers.MultipleChoiceField(
+        choices=Task.STATUS_CHOICES, required=False
+    )
+    priority = serializers.MultipleChoiceField(
+        choices=Task.PRIORITY_CHOICES, required=False
+    )
+    assignee = serializers.IntegerField(required=False, min_value=1)
+    creator = serializers.IntegerField(required=False, min_value=1)
+    deadline_after = serializers.DateTimeField(required=False)
+    deadline_before = serializers.DateTimeField(required=False)
+    created_after = serializers.DateTimeField(required=False)
+    created_before = serializers.DateTimeField(required=False)
+    overdue = serializers.BooleanField(
+        required=False,
+        allow_null=True,
+        help_text="Active tasks whose deadline has passed, or the others.",
+    )
+    ordering = serializers.ChoiceField(
+        choices=ORDERING_CHOICES,
+        required=False,
+        help_text="Ordering by deadline leaves out tasks without one.",
+    )
+
+    def validate(self, attrs):
+        for field in ("deadline", "created"):
+            after = attrs.get(f"{field}_after")
+            before = attrs.get(f"{field}_before")
+            if after and before and after > before:
+                raise serializers.ValidationError(
+                    {f"{field}_before": f"Must be after {field}_after."}
+                )
+        return attrs
+
+    def filter_queryset(self, queryset):
+        data = self.validated_data
+        if data.get("status"):
+            queryset = queryset.filter(status__in=data["status"])
+        if data.get("priority"):
+            queryset = queryset.filter(priority__in=data["priority"])
+        if "assignee" in data:
+            queryset = queryset.filter(assignees=data["assignee"])
+        if "creator" in data:
+            queryset = queryset.filter(creator=data["creator"])
+        if "deadline_after" in data:
+            queryset = queryset.filter(deadline__gte=data["deadline_after"])
+        if "deadline_before" in data:
+            queryset = queryset.filter(deadline__lt=data["deadline_before"])
+        if "created_after" in data:
+            queryset = queryset.filter(created_at__gte=data["created_after"])
+        if "created_before" in data:
+            queryset = queryset.filter(created_at__lt=data["created_before"])
+        if data.get("overdue") is not None:
+            overdue = Q(
+                deadline__lt=timezone.now(),
+                status__in=ACTIVE_STATUSES,
+            )
+            queryset = queryset.filter(
+                overdue if data["overdue"] else ~overdue
+            )
+        if data.get("ordering", "").lstrip("-") == "deadline":
+            queryset = queryset.filter(deadline__isnull=False)
+        return queryset
+
+
+class BulkTaskListSerializer(serializers.ListSerializer):
+    """
+    Validates the items one by one, then checks the workspaces, assignees
+    and, for updates, the tasks of the whole list at once.
+    """
+
+    def to_internal_value(self, data):
+        # Errors raised here keep one entry per item, unlike validate().
+        items = super().to_internal_value(data)
+        workspace_ids = get_workspace_ids(self.context["request"].user)
+
+        assignee_ids = {
+            pk for item in items for pk in item.get("assignee_ids", ())
+        }
+        users = set(
+            User.objects.filter(pk__in=assignee_ids).values_list(
+                "pk", flat=True
+            )
+        )
+
+        task_ids = [item["id"] for item in items if "id" in item]
+        tasks = Task.objects.filter(workspace__in=workspace_ids).in_bulk(
+            task_ids
+        )
+
+        errors = []
+        seen = set()
+        for item in items:
+            error = {}
+            if "workspace" in item and item["workspace"] not in workspace_ids:
+                error["workspace"] = [
+                    "You are not a member of this workspace."
+                ]
+            missing = set(item.get("assignee_ids", ())) - users
+            if missing:
+                error["assignee_ids"] = [f"Unknown users: {sorted(missing)}."]
+            if self.partial:
+                if "id" not in item:
+                    error["id"] = ["This field is required."]
+                elif item["id"] not in tasks:
+                    error["id"] = ["Task not found."]
+                elif item["id"] in seen:
+                    error["id"] = ["Duplicate task."]
+                else:
+                    seen.add(item["id"])
+                    item["instance"] = tasks[item["id"]]
+            errors.append(error)
+
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return items
+
+
+class TaskBulkCreateSerializer(serializers.ModelSerializer):
+    workspace = serializers.IntegerField()
+    assignee_ids = serializers.ListField(
+        child=serializers.IntegerField(), required=False, default=list
+    )
+
+    class Meta:
+        model = Task
+        fields = [
+            "workspace",
+            "title",
+            "description",
+            "deadline",
+            "priority",
+            "status",
+            "assignee_ids",
+        ]
+        list_serializer_class = BulkTaskListSerializer
+
+
+class TaskBulkUpdateSerializer(TaskBulkCreateSerializer):
+    """Only ``id`` is required; ``assignee_ids`` replaces the assignees."""
+
+    id = serializers.IntegerField()
+
+    class Meta(TaskBulkCreateSerializer.Meta):
+        fields = ["id", *TaskBulkCreateSerializer.Meta.fields]
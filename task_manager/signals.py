@@ -0,0 +1,391 @@
+import logging
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+from kombu.exceptions import OperationalError
+
+from task_manager.cache import (
+    bump_content_versions,
+    increment_unread_count,
+    invalidate_unread_counts,
+    invalidate_workspace_ids,
+)
+from task_manager.models import (
+    Comment,
+    Notification,
+    Task,
+    TaskFile,
+    Tombstone,
+    Workspace,
+)
+from task_manager.realtime import (
+    publish_event,
+    user_channel,
+    workspace_channel,
+)
+from task_manager.search import get_search_backend
+from task_manager.serializers import (
+    CommentSerializer,
+    NotificationSerializer,
+    TaskFileSerializer,
+    TaskSummarySerializer,
+)
+from task_manager.tasks import (
+    ACTIVE_STATUSES,
+    generate_thumbnail,
+    schedule_deadline_reminder,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+def _cascaded_from(origin, *senders):
+    """Whether a post_delete was caused by deleting one of ``senders``."""
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return issubclass(model, senders)
+
+
+def _publish_task(task, event_type):
+    publish_event(
+        workspace_channel(task.workspace_id),
+        event_type,
+        TaskSummarySerializer(task).data,
+    )
+
+
+def publish_task_event(task, event_type):
+    """
+    Publishes ``event_type`` for ``task`` once the transaction commits,
+    rendering it then. Within a transaction the task is only published
+    once, by its first event: a save followed by an assignee change is a
+    single edit.
+    """
+    connection = transaction.get_connection()
+    if connection.in_atomic_block:
+        # Replaced by a new list when the transaction ends.
+        batch = connection.run_on_commit
+        if getattr(task, "_published_in", None) is batch:
+            return
+        task._published_in = batch
+    transaction.on_commit(partial(_publish_task, task, event_type))
+
+
+@receiver(m2m_changed, sender=Task.assignees.through)
+def touch_tasks_on_assignees_change(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    # Assignee changes don't go through Task.save(), so bump updated_at
+    # by hand for the incremental jobs that rely on it.
+    if action in ("post_add", "post_remove"):
+        task_ids = pk_set if reverse else {instance.pk}
+    elif action == "pre_clear":
+        task_ids = (
+            set(instance.assigned_tasks.values_list("pk", flat=True))
+            if reverse
+            else {instance.pk}
+        )
+    else:
+        return
+
+    if task_ids:
+        now = timezone.now()
+        Task.objects.filter(pk__in=task_ids).update(updated_at=now)
+        if not reverse:
+            instance.updated_at = now
+
+    if not reverse and action != "pre_clear":
+        publish_task_event(instance, "task.updated")
+
+
+@receiver(pre_save, sender=Task)
+def detect_deadline_change(sender, instance, raw, **kwargs):
+    if settings.DEADLINE_REMINDERS_MODE != "eta" or raw:
+        return
+
+    previous = (
+        Task.objects.filter(pk=instance.pk)
+        .values("deadline", "status")
+        .first()
+        if instance.pk
+        else None
+    )
+    instance._reschedule_reminder = (
+        previous is None
+        or previous["deadline"] != instance.deadline
+        or (previous["status"] in ACTIVE_STATUSES)
+        != (instance.status in ACTIVE_STATUSES)
+    )
+
+
+@receiver(post_save, sender=Task)
+def reschedule_deadline_reminder(sender, instance, **kwargs):
+    if getattr(instance, "_reschedule_reminder", False):
+        instance._reschedule_reminder = False
+        transaction.on_commit(lambda: schedule_deadline_reminder(instance))
+
+
+@receiver(post_save, sender=Notification)
+def update_unread_count(sender, instance, created, **kwargs):
+    if created and not instance.is_read:
+        transaction.on_commit(lambda: increment_unread_count(instance.user_id))
+    else:
+        transaction.on_commit(
+            lambda: invalidate_unread_counts([instance.user_id])
+        )
+
+
+@receiver(m2m_changed, sender=Workspace.members.through)
+def invalidate_memberships(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    if action in ("post_add", "post_remove"):
+        user_ids = {instance.pk} if reverse else pk_set
+    elif action == "pre_clear":
+        user_ids = (
+            {instance.pk}
+            if reverse
+            else set(instance.members.values_list("pk", flat=True))
+        )
+    else:
+        return
+
+    if reverse:
+        instance.__dict__.pop("_workspace_ids", None)
+    transaction.on_commit(partial(invalidate_workspace_ids, user_ids))
+
+
+@receiver(m2m_changed, sender=Workspace.members.through)
+def bump_versions_on_membership_change(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    if action in ("post_add", "post_remove"):
+        workspace_ids = pk_set if reverse else {instance.pk}
+    elif action == "pre_clear":
+        workspace_ids = (
+            set(instance.workspaces.values_list("pk", flat=True))
+            if reverse
+            else {instance.pk}
+        )
+    else:
+        return
+
+    transaction.on_commit(partial(bump_content_versions, workspace_ids))
+
+
+@receiver(pre_delete, sender=Workspace)
+def invalidate_memberships_on_delete(sender, instance, **kwargs):
+    user_ids = set(instance.members.values_list("pk", flat=True))
+    transaction.on_commit(partial(invalidate_workspace_ids, user_ids))
+
+
+def _queue_thumbnail(task_file_id):
+    try:
+        generate_thumbnail.delay(task_file_id)
+    except OperationalError as e:
+        logger.warning(f"⚠️ Thumbnail for file {task_file_id} not queued: {e}")
+
+
+@receiver(post_save, sender=TaskFile)
+def queue_thumbnail(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        transaction.on_commit(partial(_queue_thumbnail, instance.pk))
+
+
+@receiver(post_save, sender=Task)
+def publish_task_saved(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    publish_task_event(instance, "task.created" if created else "task.updated")
+
+
+@receiver(post_delete, sender=Task)
+def publish_task_deleted(sender, instance, origin, **kwargs):
+    if _cascaded_from(origin, Workspace):
+        return
+    publish_event(
+        workspace_channel(instance.workspace_id),
+        "task.deleted",
+        {"id": instance.pk},
+    )
+
+
+@receiver(post_save, sender=Comment)
+def publish_comment_saved(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    publish_event(
+        workspace_channel(instance.task.workspace_id),
+        "comment.created" if created else "comment.updated",
+        CommentSerializer(instance).data,
+    )
+
+
+@receiver(post_delete, sender=Comment)
+def publish_comment_deleted(sender, instance, origin, **kwargs):
+    # Comments removed along with their task are covered by task.deleted.
+    if _cascaded_from(origin, Task, Workspace):
+        return
+    publish_event(
+        workspace_channel(instance.task.workspace_id),
+        "comment.deleted",
+        {"id": instance.pk, "task": instance.task_id},
+    )
+
+
+@receiver(post_save, sender=TaskFile)
+def publish_file_created(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        publish_event(
+            workspace_channel(instance.task.workspace_id),
+            "file.created",
+            {"task": instance.task_id, **TaskFileSerializer(instance).data},
+        )
+
+
+@receiver(post_save, sender=Notification)
+def publish_notification_created(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        publish_event(
+            user_channel(instance.user_id),
+            "notification.created",
+            NotificationSerializer(instance).data,
+        )
+
+
+@receiver(post_delete, sender=Task)
+def record_task_tombstone(sender, instance, origin, **kwargs):
+    if _cascaded_from(origin, Workspace):
+        return
+    Tombstone.objects.create(
+        workspace_id=instance.workspace_id, kind="task", object_id=instance.pk
+    )
+
+
+@receiver(post_save, sender=Task)
+def record_task_moved(sender, instance, created, raw, **kwargs):
+    # A moved task is gone from its previous workspace; its comments now
+    # sync with the new one.
+    previous_workspace_id = getattr(instance, "_previous_workspace_id", None)
+    if previous_workspace_id in (None, instance.workspace_id):
+        return
+    Tombstone.objects.create(
+        workspace_id=previous_workspace_id,
+        kind="task",
+        object_id=instance.pk,
+    )
+    instance.comments.update(updated_at=timezone.now())
+
+
+@receiver(post_delete, sender=Comment)
+def record_comment_tombstone(sender, instance, origin, **kwargs):
+    # Clients drop the comments of a deleted task along with it.
+    if _cascaded_from(origin, Task, Workspace):
+        return
+    Tombstone.objects.create(
+        workspace_id=instance.task.workspace_id,
+        kind="comment",
+        object_id=instance.pk,
+    )
+
+
+def _bump_content_versions(*workspace_ids):
+    transaction.on_commit(
+        partial(bump_content_versions, set(workspace_ids) - {None})
+    )
+
+
+@receiver(pre_save, sender=Task)
+def remember_workspace(sender, instance, raw, **kwargs):
+    # A task moved to another workspace changes the content of both.
+    if instance.pk and not raw:
+        instance._previous_workspace_id = (
+            Task.objects.filter(pk=instance.pk)
+            .values_list("workspace_id", flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def bump_versions_on_task_change(sender, instance, **kwargs):
+    _bump_content_versions(
+        instance.workspace_id,
+        getattr(instance, "_previous_workspace_id", None),
+    )
+
+
+@receiver(m2m_changed, sender=Task.assignees.through)
+def bump_versions_on_assignees_change(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        _bump_content_versions(instance.workspace_id)
+    elif action != "post_clear":
+        _bump_content_versions(
+            *Task.objects.filter(pk__in=pk_set).values_list(
+                "workspace_id", flat=True
+            )
+        )
+    else:
+        # The cleared tasks are gone from the relation by now.
+        _bump_content_versions(
+            *instance.workspaces.values_list("pk", flat=True)
+        )
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=TaskFile)
+@receiver(post_delete, sender=TaskFile)
+def bump_versions_on_task_child_change(
+    sender, instance, origin=None, **kwargs
+):
+    if _cascaded_from(origin, Task, Workspace):
+        return
+    _bump_content_versions(instance.task.workspace_id)
+
+
+@receiver(m2m_changed, sender=Comment.files.through)
+def bump_versions_on_comment_files_change(
+    sender, instance, action, reverse, **kwargs
+):
+    if action in ("post_add", "post_remove", "post_clear"):
+        _bump_content_versions(instance.task.workspace_id)
+
+
+@receiver(post_save, sender=Task)
+def index_task(sender, instance, **kwargs):
+    backend = get_search_backend()
+    backend.index_tasks([instance])
+    previous_workspace_id = getattr(instance, "_previous_workspace_id", None)
+    if previous_workspace_id not in (None, instance.workspace_id):
+        backend.index_comments(instance.comments.select_related("task"))
+
+
+@receiver(post_delete, sender=Task)
+def unindex_task(sender, instance, **kwargs):
+    get_search_backend().remove("task", [instance.pk])
+
+
+@receiver(post_save, sender=Comment)
+def index_comment(sender, instance, **kwargs):
+    get_search_backend().index_comments([instance])
+
+
+@receiver(post_delete, sender=Comment)
+def unindex_comment(sender, instance, **kwargs):
+    get_search_backend().remove("comment", [instance.pk])
@@ -0,0 +1,437 @@
+import csv
+import io
+import json
+from functools import partial
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils.dateparse import parse_datetime
+
+from task_manager.cache import bump_content_versions, get_workspace_ids
+from task_manager.models import Comment, Task, TaskFile, Workspace
+from task_manager.search import get_search_backend
+
+
+User = get_user_model()
+
+EXPORT_CHUNK_SIZE = 2000
+IMPORT_BATCH_SIZE = 1000
+FORMATS = {
+    "jsonl": "application/x-ndjson",
+    "csv": "text/csv",
+}
+CSV_COLUMNS = [
+    "type",
+    "id",
+    "task",
+    "name",
+    "title",
+    "description",
+    "deadline",
+    "priority",
+    "status",
+    "creator",
+    "members",
+    "assignees",
+    "author",
+    "text",
+    "file",
+    "thumbnail",
+    "files",
+    "created_at",
+    "updated_at",
+    "uploaded_at",
+]
+CSV_LISTS = {"members", "assignees", "files"}
+DATETIMES = {"deadline", "created_at", "updated_at", "uploaded_at"}
+
+
+def export_records(workspace):
+    """
+    Yields the workspace, its tasks, files and comments as flat records,
+    users being referred to by username. Rows are read in chunks, so
+    memory use doesn't depend on the size of the workspace.
+    """
+    usernames = User.objects.only("username")
+
+    yield {
+        "type": "workspace",
+        "id": workspace.pk,
+        "name": workspace.name,
+        "creator": workspace.creator.username,
+        "members": [user.username for user in workspace.members.all()],
+        "created_at": workspace.created_at,
+    }
+
+    tasks = (
+        workspace.tasks.select_related("creator")
+        .prefetch_related(Prefetch("assignees", queryset=usernames))
+        .order_by("pk")
+    )
+    for task in tasks.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield {
+            "type": "task",
+            "id": task.pk,
+            "title": task.title,
+            "description": task.description,
+            "deadline": task.deadline,
+            "priority": task.priority,
+            "status": task.status,
+            "creator": task.creator.username,
+            "assignees": [user.username for user in task.assignees.all()],
+            "created_at": task.created_at,
+            "updated_at": task.updated_at,
+        }
+
+    files = TaskFile.objects.filter(task__workspace=workspace).order_by("pk")
+    for task_file in files.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield {
+            "type": "file",
+            "id": task_file.pk,
+            "task": task_file.task_id,
+            "name": task_file.name,
+            "file": task_file.file.name,
+            "thumbnail": task_file.thumbnail.name,
+            "uploaded_at": task_file.uploaded_at,
+        }
+
+    comments = (
+        Comment.objects.filter(task__workspace=workspace)
+        .select_related("author")
+        .prefetch_related(
+            Prefetch("files", queryset=TaskFile.objects.only("pk"))
+        )
+        .order_by("pk")
+    )
+    for comment in comments.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield {
+            "type": "comment",
+            "id": comment.pk,
+            "task": comment.task_id,
+            "author": comment.author.username,
+            "text": comment.text,
+            "files": [task_file.pk for task_file in comment.files.all()],
+            "created_at": comment.created_at,
+            "updated_at": comment.updated_at,
+        }
+
+
+def to_jsonl(records):
+    for record in records:
+        yield json.dumps(record, cls=DjangoJSONEncoder) + "\n"
+
+
+def _csv_value(key, value):
+    if key in CSV_LISTS:
+        return ";".join(map(str, value))
+    if key in DATETIMES and value is not None:
+        return value.isoformat()
+    return value
+
+
+def to_csv(records):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, CSV_COLUMNS, extrasaction="ignore")
+    writer.writeheader()
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    for record in records:
+        writer.writerow(
+            {key: _csv_value(key, value) for key, value in record.items()}
+        )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def read_jsonl(lines):
+    for line in lines:
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_csv(lines):
+    for row in csv.DictReader(lines):
+        record = {"type": row["type"]}
+        for key, value in row.items():
+            if key == "type" or value == "":
+                continue
+            if key in CSV_LISTS:
+                value = value.split(";")
+                if key == "files":
+                    value = [int(pk) for pk in value]
+            elif key in ("id", "task"):
+                value = int(value)
+            record[key] = value
+        for key in CSV_LISTS:
+            record.setdefault(key, [])
+        yield record
+
+
+WRITERS = {"jsonl": to_jsonl, "csv": to_csv}
+READERS = {"jsonl": read_jsonl, "csv": read_csv}
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def _batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _datetime(record, field):
+    value = record.get(field)
+    if not value:
+        return None
+    parsed = parse_datetime(value) if isinstance(value, str) else None
+    if parsed is None:
+        raise SnapshotError(
+            f"{record['type']} {record.get('id')}: invalid {field}."
+        )
+    return parsed
+
+
+def _validated(obj, record, relations):
+    """``obj``, once its fields pass the model's choices and lengths."""
+    try:
+        obj.clean_fields(exclude=relations)
+    except ValidationError as e:
+        errors = "; ".join(
+            f"{field}: {' '.join(messages)}"
+            for field, messages in e.message_dict.items()
+        )
+        raise SnapshotError(f"{record['type']} {record.get('id')}: {errors}")
+    return obj
+
+
+def _checked(records):
+    """``records``, with what a malformed file raises as SnapshotError."""
+    try:
+        for record in records:
+            if not isinstance(record, dict) or not isinstance(
+                record.get("type"), str
+            ):
+                raise SnapshotError(
+                    "Every record must be an object with a type."
+                )
+            yield record
+    except KeyError as e:
+        raise SnapshotError(f"A row has no {e} column.") from e
+    except (csv.Error, ValueError) as e:
+        raise SnapshotError(str(e)) from e
+
+
+class _Importer:
+    def __init__(self, owner, name):
+        self.owner = owner
+        self.name = name
+        self.workspace = None
+        self.member_ids = {owner.username: owner.pk}
+        self.task_ids = {}
+        self.file_ids = {}
+        self.counts = {"tasks": 0, "files": 0, "comments": 0, "skipped": 0}
+
+    def run(self, kind, records):
+        """Imports ``records`` of type ``kind``, all of them valid."""
+        handlers = {
+            "task": self.import_tasks,
+            "file": self.import_files,
+            "comment": self.import_comments,
+        }
+        if kind not in handlers:
+            raise SnapshotError(f"Unknown record type {kind!r}.")
+        try:
+            handlers[kind](records)
+        except KeyError as e:
+            raise SnapshotError(f"A {kind} record has no {e}.") from e
+        except (AttributeError, TypeError, ValueError) as e:
+            raise SnapshotError(f"Invalid {kind} record: {e}") from e
+
+    def import_workspace(self, record):
+        # Only users the owner already shares a workspace with are added,
+        # as the owner could add them to any of those.
+        self.member_ids.update(
+            User.objects.filter(
+                username__in=record.get("members", []),
+                workspaces__in=get_workspace_ids(self.owner),
+            )
+            .distinct()
+            .values_list("username", "pk")
+        )
+        self.workspace = _validated(
+            Workspace(name=self.name or record["name"], creator=self.owner),
+            record,
+            ["creator"],
+        )
+        self.workspace.save()
+        self.workspace.members.add(*self.member_ids.values())
+
+    def import_tasks(self, records):
+        # Creators and authors are whoever imports: an export can't make
+        # rows appear written by someone else.
+        tasks = Task.objects.bulk_create(
+            [
+                _validated(
+                    Task(
+                        workspace=self.workspace,
+                        title=record["title"],
+                        description=record.get("description") or "",
+                        deadline=_datetime(record, "deadline"),
+                        priority=record.get("priority") or "medium",
+                        status=record.get("status") or "todo",
+                        creator=self.owner,
+                    ),
+                    record,
+                    ["workspace", "creator"],
+                )
+                for record in records
+            ]
+        )
+        # updated_at stays now(): the deadline scan only re-examines tasks
+        # updated since its last run, and these were never notified.
+        self._restore_timestamps(tasks, records, ["created_at"])
+
+        Through = Task.assignees.through
+        Through.objects.bulk_create(
+            [
+                Through(task_id=task.pk, user_id=self.member_ids[name])
+                for task, record in zip(tasks, records)
+                for name in set(record["assignees"])
+                if name in self.member_ids
+            ]
+        )
+        for task, record in zip(tasks, records):
+            self.task_ids[record["id"]] = task.pk
+        self.counts["tasks"] += len(tasks)
+
+    def import_files(self, records):
+        # Only the metadata is exported, so rows may only point at blobs
+        # the owner can already download from another workspace.
+        thumbnails = dict(
+            TaskFile.objects.filter(
+                file__in=[record["file"] for record in records],
+                task__workspace__in=get_workspace_ids(self.owner),
+            ).values_list("file", "thumbnail")
+        )
+        kept = [
+            record
+            for record in records
+            if record["task"] in self.task_ids and record["file"] in thumbnails
+        ]
+        self.counts["skipped"] += len(records) - len(kept)
+        records = kept
+        files = TaskFile.objects.bulk_create(
+            [
+                _validated(
+                    TaskFile(
+                        task_id=self.task_ids[record["task"]],
+                        name=record.get("name") or "",
+                        file=record["file"],
+                        thumbnail=thumbnails[record["file"]],
+                    ),
+                    record,
+                    ["task"],
+                )
+                for record in records
+            ]
+        )
+        self._restore_timestamps(files, records, ["uploaded_at"])
+        for task_file, record in zip(files, records):
+            self.file_ids[record["id"]] = task_file.pk
+        self.counts["files"] += len(files)
+
+    def import_comments(self, records):
+        kept = [
+            record for record in records if record["task"] in self.task_ids
+        ]
+        self.counts["skipped"] += len(records) - len(kept)
+        records = kept
+        comments = Comment.objects.bulk_create(
+            [
+                _validated(
+                    Comment(
+                        task_id=self.task_ids[record["task"]],
+                        author=self.owner,
+                        text=record["text"],
+                    ),
+                    record,
+                    ["task", "author"],
+                )
+                for record in records
+            ]
+        )
+        self._restore_timestamps(
+            comments, records, ["created_at", "updated_at"]
+        )
+
+        Through = Comment.files.through
+        Through.objects.bulk_create(
+            [
+                Through(comment_id=comment.pk, taskfile_id=self.file_ids[pk])
+                for comment, record in zip(comments, records)
+                for pk in set(record["files"])
+                if pk in self.file_ids
+            ]
+        )
+        self.counts["comments"] += len(comments)
+
+    def _restore_timestamps(self, objects, records, fields):
+        # bulk_create() stamps auto_now(_add) fields; bulk_update() doesn't.
+        restored = []
+        for obj, record in zip(objects, records):
+            values = {
+                field: _datetime(record, field)
+                for field in fields
+                if record.get(field)
+            }
+            if values:
+                for field, value in values.items():
+                    setattr(obj, field, value)
+                restored.append(obj)
+        if restored:
+            type(restored[0]).objects.bulk_update(restored, fields)
+
+
+def import_records(records, owner, name=None):
+    """
+    Restores exported ``records`` into a new workspace owned by
+    ``owner``, ``IMPORT_BATCH_SIZE`` rows per insert and all in one
+    transaction. Rows are validated like the models' forms; creators and
+    authors become ``owner``, members are kept if ``owner`` already shares
+    a workspace with them, and assignees if they are members.
+    Returns the workspace and the number of rows imported; a malformed
+    export raises ``SnapshotError``.
+    """
+    importer = _Importer(owner, name)
+
+    with transaction.atomic():
+        records = _checked(records)
+        first = next(records, None)
+        if first is None or first["type"] != "workspace":
+            raise SnapshotError("The export must start with its workspace.")
+        try:
+            importer.import_workspace(first)
+        except (KeyError, TypeError, ValueError) as e:
+            raise SnapshotError(f"Invalid workspace record: {e}") from e
+
+        for batch in _batched(records, IMPORT_BATCH_SIZE):
+            # Records come grouped by type; split batches where it changes.
+            start = 0
+            for i in range(1, len(batch) + 1):
+                if i == len(batch) or batch[i]["type"] != batch[start]["type"]:
+                    importer.run(batch[start]["type"], batch[start:i])
+                    start = i
+
+        workspace = importer.workspace
+        get_search_backend().rebuild(workspace_id=workspace.pk)
+        transaction.on_commit(partial(bump_content_versions, [workspace.pk]))
+
+    return workspace, importer.counts
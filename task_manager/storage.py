@@ -0,0 +1,134 @@
+import hashlib
+import os
+import re
+import tempfile
+import time
+import uuid
+
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage, storages
+
+
+READ_SIZE = 1024 * 1024
+BLOB_NAME = re.compile(
+    r"(^|/)[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(\.[^/.]*)?$"
+)
+
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        while chunk := fh.read(READ_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stores every distinct content once, under
+    ``<upload_to>/<ab>/<cd>/<sha256><ext>``, hashing it while it is
+    written. Saving content that is already stored only returns the name
+    of the existing blob. Blobs are shared between ``TaskFile`` rows, the
+    reference count being the number of rows pointing at the name, and
+    are only deleted by ``purge_orphaned_blobs``. Files stored before
+    content addressing keep their names and aren't deduplicated.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is derived from the content in _save().
+        return name
+
+    def _save(self, name, content):
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        temp_dir = os.path.join(self.location, ".tmp")
+        os.makedirs(temp_dir, exist_ok=True)
+
+        if hasattr(content, "temporary_file_path"):
+            # Already on local disk: hash it in place and move it.
+            temp_path = content.temporary_file_path()
+            digest = getattr(content, "sha256", None) or _hash_file(temp_path)
+        else:
+            digest, temp_path = self._write_temp(content, temp_dir)
+
+        blob_name = os.path.join(
+            directory, digest[:2], digest[2:4], digest + extension
+        )
+        full_path = self.path(blob_name)
+        try:
+            # Reusing a blob restarts its grace period, see delete_orphan().
+            os.utime(full_path)
+        except FileNotFoundError:
+            pass
+        else:
+            if temp_path.startswith(temp_dir):
+                os.remove(temp_path)
+            return blob_name
+
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        file_move_safe(temp_path, full_path, allow_overwrite=True)
+        if self.file_permissions_mode is not None:
+            os.chmod(full_path, self.file_permissions_mode)
+        return blob_name
+
+    def _write_temp(self, content, temp_dir):
+        digest = hashlib.sha256()
+        fd, temp_path = tempfile.mkstemp(dir=temp_dir)
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                if hasattr(content, "seek"):
+                    content.seek(0)
+                for chunk in content.chunks(READ_SIZE):
+                    digest.update(chunk)
+                    fh.write(chunk)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        return digest.hexdigest(), temp_path
+
+    def blobs(self, directory, older_than):
+        """
+        Names of the blobs under ``directory`` neither written nor reused
+        in the last ``older_than`` seconds.
+        """
+        deadline = time.time() - older_than
+        root = self.path(directory)
+        for path, _, filenames in os.walk(root):
+            for filename in filenames:
+                full_path = os.path.join(path, filename)
+                name = os.path.relpath(full_path, self.location)
+                if not BLOB_NAME.search(name):
+                    continue
+                try:
+                    if os.stat(full_path).st_mtime < deadline:
+                        yield name
+                except FileNotFoundError:
+                    pass
+
+    def delete_orphan(self, name, older_than, is_referenced):
+        """
+        Deletes blob ``name`` unless ``is_referenced(name)`` or it was
+        written or reused in the last ``older_than`` seconds. The blob is
+        moved aside first, so that an upload of the same content either
+        saw it and restarted its grace period, or stores it again.
+        """
+        temp_dir = os.path.join(self.location, ".tmp")
+        os.makedirs(temp_dir, exist_ok=True)
+        full_path = self.path(name)
+        held = os.path.join(temp_dir, uuid.uuid4().hex)
+        try:
+            os.rename(full_path, held)
+        except FileNotFoundError:
+            return False
+
+        if os.stat(held).st_mtime >= time.time() - older_than or is_referenced(
+            name
+        ):
+            os.replace(held, full_path)
+            return False
+        os.remove(held)
+        return True
+
+
+def get_task_file_storage():
+    return storages["task_files"]
@@ -0,0 +1,100 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from task_manager.models import Comment, Task, Tombstone
+from task_manager.serializers import CommentSerializer, TaskSummarySerializer
+
+
+TOKEN_SALT = "task_manager.sync"
+# Rows are re-sent if they changed shortly before the previous sync, so
+# writes that committed after it with an earlier timestamp are not
+# missed; clients apply changes as upserts.
+SYNC_OVERLAP = timedelta(seconds=5)
+
+
+class InvalidSyncToken(Exception):
+    pass
+
+
+class ExpiredSyncToken(Exception):
+    pass
+
+
+def make_token(workspace_id, horizon):
+    return signing.dumps(
+        {"w": workspace_id, "t": horizon.isoformat()}, salt=TOKEN_SALT
+    )
+
+
+def read_token(token, workspace_id):
+    """
+    Returns the horizon stored in ``token``, or ``None`` for a full sync
+    when no token is given.
+    """
+    if not token:
+        return None
+    try:
+        payload = signing.loads(token, salt=TOKEN_SALT)
+    except signing.BadSignature:
+        raise InvalidSyncToken("Invalid sync token.")
+    if payload.get("w") != workspace_id:
+        raise InvalidSyncToken("Sync token belongs to another workspace.")
+
+    horizon = parse_datetime(payload.get("t") or "")
+    if horizon is None:
+        raise InvalidSyncToken("Invalid sync token.")
+    # Deletions older than the retention period are gone from the log.
+    if horizon < timezone.now() - timedelta(
+        days=settings.SYNC_TOMBSTONE_RETENTION_DAYS
+    ):
+        raise ExpiredSyncToken("Sync token expired, a full sync is needed.")
+    return horizon
+
+
+def changes_since(workspace, since, context=None):
+    """
+    Tasks and comments of ``workspace`` created or updated since
+    ``since`` together with the ids deleted since then, and the token to
+    pass on the next call.
+    """
+    horizon = timezone.now()
+
+    tasks = Task.objects.filter(workspace=workspace)
+    comments = Comment.objects.filter(task__workspace=workspace)
+    deleted = {"tasks": [], "comments": []}
+    if since is not None:
+        cutoff = since - SYNC_OVERLAP
+        tasks = tasks.filter(updated_at__gte=cutoff)
+        comments = comments.filter(updated_at__gte=cutoff)
+        tombstones = Tombstone.objects.filter(
+            workspace=workspace, deleted_at__gte=cutoff
+        ).values_list("kind", "object_id")
+        for kind, object_id in tombstones:
+            deleted[f"{kind}s"].append(object_id)
+
+    tasks = TaskSummarySerializer(
+        expand=["description"], context=context
+    ).setup_eager_loading(tasks.order_by("id"))
+    comments = CommentSerializer(context=context).setup_eager_loading(
+        comments.order_by("id")
+    )
+
+    tasks = TaskSummarySerializer(
+        tasks, many=True, expand=["description"], context=context
+    ).data
+    # A task moved out and back again is still there.
+    present = {task["id"] for task in tasks}
+    deleted["tasks"] = [pk for pk in deleted["tasks"] if pk not in present]
+
+    return {
+        "tasks": tasks,
+        "comments": CommentSerializer(
+            comments, many=True, context=context
+        ).data,
+        "deleted": deleted,
+        "next": make_token(workspace.pk, horizon),
+    }
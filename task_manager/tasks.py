@@ -1,73 +1,455 @@
+import gzip
+import json
 import logging
 from datetime import timedelta
+from functools import partial
+from itertools import islice
+from pathlib import Path
 
-from celery import shared_task
+from celery import current_app, shared_task
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from kombu.exceptions import OperationalError
 
-from task_manager.models import Notification, Task
+from task_manager.cache import (
+    bump_content_versions,
+    invalidate_unread_counts,
+)
+from task_manager.jobs import instrumented
+from task_manager.models import (
+    JobWatermark,
+    Notification,
+    Task,
+    TaskFile,
+    Tombstone,
+    UploadSession,
+)
+from task_manager.realtime import publish_events, user_channel
+from task_manager.storage import get_task_file_storage
+from task_manager.thumbnails import render_thumbnail
+from task_manager.uploads import discard
 
 
 logger = logging.getLogger(__name__)
 
+ACTIVE_STATUSES = ["todo", "in_progress"]
+REMINDER_LEAD = timedelta(days=1)
+NOTIFICATION_BATCH_SIZE = 1000
+NOTIFICATION_PURGE_BATCH_SIZE = 1000
+DEADLINE_SCAN_WATERMARK = "notify_upcoming_deadlines"
+# Re-examine rows touched shortly before the previous run started, so
+# writes that committed late are not missed; notifying is idempotent.
+WATERMARK_OVERLAP = timedelta(minutes=1)
+# Blobs are kept this long after being written or reused, which covers
+# an upload saving its TaskFile after finding the blob already stored.
+ORPHANED_BLOB_GRACE = timedelta(days=1)
+
+
+def _batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _deadline_message(task):
+    deadline_local = timezone.localtime(task.deadline).strftime(
+        "%b %d, %Y at %I:%M %p"
+    )
+    workspace_name = task.workspace.name
+    return f"Task '{task.title}' is due soon on {deadline_local} (Workspace: {workspace_name})"
+
+
+def _pending_recipients(tasks):
+    """
+    Returns a single query yielding the ``(user_id, task_id)`` pairs of
+    creators and assignees of ``tasks`` who have not been notified about
+    the task yet.
+    """
+    task_ids = tasks.values("pk")
+    assignees = (
+        Task.assignees.through.objects.filter(task__in=task_ids)
+        .exclude(
+            Exists(
+                Notification.objects.filter(
+                    user=OuterRef("user_id"), task=OuterRef("task_id")
+                )
+            )
+        )
+        .values_list("user_id", "task_id")
+    )
+    creators = (
+        Task.objects.filter(pk__in=task_ids)
+        .exclude(
+            Exists(
+                Notification.objects.filter(
+                    user=OuterRef("creator_id"), task=OuterRef("pk")
+                )
+            )
+        )
+        .values_list("creator_id", "pk")
+    )
+    return assignees.union(creators)
+
+
+def create_deadline_notifications(tasks):
+    """
+    Notifies the creator and assignees of every task in ``tasks`` once,
+    inserting the missing notifications in batches. Safe to run
+    concurrently: duplicates are rejected by the (user, task) constraint,
+    and only the notifications inserted are counted and published.
+    """
+    created = 0
+    notified_users = set()
+    recipients = _pending_recipients(tasks).iterator(
+        chunk_size=NOTIFICATION_BATCH_SIZE
+    )
+    for batch in _batched(recipients, NOTIFICATION_BATCH_SIZE):
+        batch_tasks = (
+            Task.objects.select_related("workspace")
+            .only("title", "deadline", "workspace__name")
+            .in_bulk({task_id for _, task_id in batch})
+        )
+        notifications = [
+            Notification(
+                user_id=user_id,
+                task_id=task_id,
+                message=_deadline_message(batch_tasks[task_id]),
+            )
+            for user_id, task_id in batch
+        ]
+        Notification.objects.bulk_create(notifications, ignore_conflicts=True)
+        # Rows another run inserted first were dropped. Ours are those
+        # carrying the creation time bulk_create() stamped on them.
+        inserted = set(
+            Notification.objects.filter(
+                user_id__in={user_id for user_id, _ in batch},
+                task_id__in={task_id for _, task_id in batch},
+            ).values_list("user_id", "task_id", "created_at")
+        )
+        notifications = [
+            notification
+            for notification in notifications
+            if (
+                notification.user_id,
+                notification.task_id,
+                notification.created_at,
+            )
+            in inserted
+        ]
+        publish_events(
+            (
+                user_channel(notification.user_id),
+                "notification.created",
+                {
+                    "user": notification.user_id,
+                    "task": notification.task_id,
+                    "message": notification.message,
+                    "is_read": False,
+                },
+            )
+            for notification in notifications
+        )
+        notified_users.update(
+            notification.user_id for notification in notifications
+        )
+        created += len(notifications)
+
+    transaction.on_commit(partial(invalidate_unread_counts, notified_users))
+    return created
+
 
 @shared_task
+@instrumented(items="notifications", budget=60, exclusive=True)
 def notify_upcoming_deadlines():
     logger.info("🚀 notify_upcoming_deadlines started")
 
     now = timezone.now()
     soon = now + timedelta(days=1)
 
-    tasks = (
-        Task.objects.filter(
+    with transaction.atomic():
+        watermark = (
+            JobWatermark.objects.select_for_update()
+            .filter(name=DEADLINE_SCAN_WATERMARK)
+            .first()
+        )
+
+        tasks = Task.objects.filter(
             deadline__isnull=False,
             deadline__gte=now,
             deadline__lte=soon,
-            status__in=["todo", "in_progress"],
+            status__in=ACTIVE_STATUSES,
         )
-        .select_related("workspace", "creator")
-        .prefetch_related("assignees")
-    )
+        if watermark is not None:
+            # Only tasks whose deadline entered the window since the last
+            # run, or whose deadline, status or assignees changed.
+            tasks = tasks.filter(
+                Q(deadline__gt=watermark.horizon)
+                | Q(updated_at__gte=watermark.scanned_at - WATERMARK_OVERLAP)
+            )
+        created = create_deadline_notifications(tasks)
+
+        JobWatermark.objects.update_or_create(
+            name=DEADLINE_SCAN_WATERMARK,
+            defaults={"horizon": soon, "scanned_at": now},
+        )
+
+    logger.info(f"✅ {created} deadline notifications created")
+    return created
 
-    for task in tasks:
-        if not task.workspace:
-            logger.warning(f"⚠️ Task {task.id} has no workspace assigned")
-            continue
 
-        try:
-            deadline_local = timezone.localtime(task.deadline).strftime(
-                "%b %d, %Y at %I:%M %p"
+def schedule_deadline_reminder(task):
+    """
+    Schedules a single reminder for ``task`` at ``deadline - 1 day``,
+    revoking the one scheduled for its previous deadline, if any. Returns
+    the id of the reminder, empty if none was scheduled.
+    """
+    reminder_task_id = ""
+    now = timezone.now()
+    try:
+        if task.reminder_task_id and not current_app.conf.task_always_eager:
+            # Best effort only: a stale reminder that still fires checks
+            # the deadline it was scheduled for and does nothing.
+            current_app.control.revoke(task.reminder_task_id)
+
+        if (
+            task.deadline is not None
+            and task.deadline > now
+            and task.status in ACTIVE_STATUSES
+        ):
+            result = send_deadline_reminder.apply_async(
+                args=[task.pk, task.deadline.isoformat()],
+                eta=max(task.deadline - REMINDER_LEAD, now),
             )
-            workspace_name = task.workspace.name
-            message = f"Task '{task.title}' is due soon on {deadline_local} (Workspace: {workspace_name})"
-
-            if task.creator:
-                if not Notification.objects.filter(
-                    user=task.creator, task=task
-                ).exists():
-                    Notification.objects.create(
-                        user=task.creator,
-                        message=message,
-                        task=task,
+            reminder_task_id = result.id
+    except OperationalError as e:
+        # Left unscheduled, reconcile_deadline_reminders retries it.
+        logger.warning(f"⚠️ Reminder for task {task.pk} not scheduled: {e}")
+
+    Task.objects.filter(pk=task.pk).update(reminder_task_id=reminder_task_id)
+    task.reminder_task_id = reminder_task_id
+    return reminder_task_id
+
+
+@shared_task
+@instrumented(items="notifications")
+def send_deadline_reminder(task_id, deadline):
+    tasks = Task.objects.filter(
+        pk=task_id,
+        deadline=parse_datetime(deadline),
+        status__in=ACTIVE_STATUSES,
+    )
+    created = create_deadline_notifications(tasks)
+    logger.info(f"✅ {created} reminders sent for task {task_id}")
+    return created
+
+
+@shared_task
+@instrumented(budget=60 * 60, exclusive=True)
+def reconcile_deadline_reminders():
+    """
+    Repairs reminders lost while workers or the broker were down: tasks
+    already inside the reminder window are notified directly and tasks
+    that never got a reminder are scheduled.
+    """
+    logger.info("🚀 reconcile_deadline_reminders started")
+
+    now = timezone.now()
+    soon = now + REMINDER_LEAD
+
+    created = create_deadline_notifications(
+        Task.objects.filter(
+            deadline__gte=now,
+            deadline__lte=soon,
+            status__in=ACTIVE_STATUSES,
+        )
+    )
+
+    unscheduled = Task.objects.filter(
+        deadline__gt=soon,
+        status__in=ACTIVE_STATUSES,
+        reminder_task_id="",
+    )
+    scheduled = 0
+    for task in unscheduled.iterator():
+        if schedule_deadline_reminder(task):
+            scheduled += 1
+
+    logger.info(
+        f"✅ {created} missed reminders sent, {scheduled} reminders scheduled"
+    )
+    return {"created": created, "scheduled": scheduled}
+
+
+def _purge_in_batches(notifications, archive=None):
+    """
+    Deletes ``notifications`` in primary-key batches, each in its own
+    short transaction, writing every batch to ``archive`` first if given.
+    """
+    removed = 0
+    last_pk = 0
+    while True:
+        ids = list(
+            notifications.filter(pk__gt=last_pk)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:NOTIFICATION_PURGE_BATCH_SIZE]
+        )
+        if not ids:
+            return removed
+        last_pk = ids[-1]
+
+        with transaction.atomic():
+            batch = Notification.objects.filter(pk__in=ids)
+            if archive is not None:
+                rows = list(
+                    batch.values(
+                        "id",
+                        "user_id",
+                        "task_id",
+                        "message",
+                        "is_read",
+                        "created_at",
                     )
-                    logger.info(
-                        f"✅ Notification created for creator {task.creator.id}"
+                )
+                archive.writelines(
+                    json.dumps(row, cls=DjangoJSONEncoder) + "\n"
+                    for row in rows
+                )
+                transaction.on_commit(
+                    partial(
+                        invalidate_unread_counts,
+                        {row["user_id"] for row in rows},
                     )
+                )
+            removed += batch.delete()[0]
+
+
+@shared_task
+@instrumented(exclusive=True)
+def purge_notifications():
+    logger.info("🚀 purge_notifications started")
+
+    now = timezone.now()
+
+    read = Notification.objects.filter(
+        is_read=True,
+        created_at__lt=now
+        - timedelta(days=settings.NOTIFICATION_RETENTION_DAYS),
+    )
+    deleted = _purge_in_batches(read)
+
+    stale = Notification.objects.filter(
+        is_read=False,
+        created_at__lt=now
+        - timedelta(days=settings.NOTIFICATION_ARCHIVE_DAYS),
+    )
+    archived = 0
+    if stale.exists():
+        archive_dir = Path(settings.NOTIFICATION_ARCHIVE_DIR)
+        archive_dir.mkdir(parents=True, exist_ok=True)
+        archive_path = (
+            archive_dir / f"notifications-{now:%Y%m%d%H%M%S}.jsonl.gz"
+        )
+        with gzip.open(archive_path, "at", encoding="utf-8") as archive:
+            archived = _purge_in_batches(stale, archive=archive)
+        logger.info(f"📦 {archived} notifications archived to {archive_path}")
+
+    logger.info(
+        f"✅ {deleted} read notifications deleted, {archived} archived"
+    )
+    return {"deleted": deleted, "archived": archived}
+
 
-            for assignee in task.assignees.exclude(
-                id=task.creator.id if task.creator else None
+@shared_task
+@instrumented(items="uploads", exclusive=True)
+def purge_stale_uploads():
+    expired = UploadSession.objects.filter(
+        created_at__lt=timezone.now()
+        - timedelta(days=settings.CHUNKED_UPLOAD_EXPIRE_DAYS)
+    )
+    purged = 0
+    for session in expired.iterator():
+        discard(session)
+        session.delete()
+        purged += 1
+
+    logger.info(f"🧹 {purged} stale upload sessions removed")
+    return purged
+
+
+@shared_task
+@instrumented(items="tombstones", exclusive=True)
+def purge_tombstones():
+    purged, _ = Tombstone.objects.filter(
+        deleted_at__lt=timezone.now()
+        - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+    ).delete()
+
+    logger.info(f"🧹 {purged} tombstones removed")
+    return purged
+
+
+def _is_blob_referenced(name):
+    return TaskFile.objects.filter(Q(file=name) | Q(thumbnail=name)).exists()
+
+
+@shared_task
+@instrumented(items="blobs", exclusive=True)
+def purge_orphaned_blobs():
+    storage = get_task_file_storage()
+    grace = ORPHANED_BLOB_GRACE.total_seconds()
+    upload_to = TaskFile._meta.get_field("file").upload_to
+    deleted = 0
+    for names in _batched(storage.blobs(upload_to, grace), 1000):
+        referenced = set()
+        for file, thumbnail in TaskFile.objects.filter(
+            Q(file__in=names) | Q(thumbnail__in=names)
+        ).values_list("file", "thumbnail"):
+            referenced.update((file, thumbnail))
+        for name in names:
+            if name not in referenced and storage.delete_orphan(
+                name, grace, _is_blob_referenced
             ):
-                if not Notification.objects.filter(
-                    user=assignee, task=task
-                ).exists():
-                    Notification.objects.create(
-                        user=assignee,
-                        message=message,
-                        task=task,
-                    )
-                    logger.info(
-                        f"✅ Notification created for assignee {assignee.id}"
-                    )
+                deleted += 1
+
+    logger.info(f"🧹 {deleted} orphaned blobs removed")
+    return deleted
 
-        except Exception as e:
-            logger.error(f"❌ Error processing task {task.id}: {str(e)}")
-            continue
+
+@shared_task
+@instrumented()
+def generate_thumbnail(task_file_id):
+    task_file = (
+        TaskFile.objects.select_related("task").filter(pk=task_file_id).first()
+    )
+    if task_file is None or task_file.thumbnail:
+        return None
+
+    # Blobs are shared, so reuse a preview rendered for the same content.
+    thumbnail = (
+        TaskFile.objects.filter(file=task_file.file.name)
+        .exclude(thumbnail="")
+        .values_list("thumbnail", flat=True)
+        .first()
+    )
+    if thumbnail is None:
+        content = render_thumbnail(task_file.file, filename=task_file.name)
+        if content is None:
+            return None
+        thumbnail = task_file.thumbnail.storage.save(
+            task_file.thumbnail.field.generate_filename(
+                task_file, content.name
+            ),
+            content,
+        )
+
+    TaskFile.objects.filter(pk=task_file_id).update(thumbnail=thumbnail)
+    # update() sends no signal; cached responses embed the thumbnail URL.
+    transaction.on_commit(
+        partial(bump_content_versions, [task_file.task.workspace_id])
+    )
+    logger.info(f"🖼️ Thumbnail stored for file {task_file_id}")
+    return thumbnail
@@ -0,0 +1,1040 @@
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import CommandError, call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from kombu.exceptions import OperationalError
+from rest_framework.exceptions import ValidationError
+from rest_framework.mixins import ListModelMixin
+from rest_framework.test import APITestCase
+
+from task_manager import cache as cache_module
+from task_manager.cache import get_workspace_ids
+from task_manager.jobs import instrumented
+from task_manager.models import (
+    Comment,
+    JobLock,
+    Notification,
+    Task,
+    TaskFile,
+    Workspace,
+)
+from task_manager.search import PostgresSearchBackend
+from task_manager.serializers import TaskSerializer
+from task_manager.tasks import (
+    create_deadline_notifications,
+    generate_thumbnail,
+    notify_upcoming_deadlines,
+    purge_orphaned_blobs,
+    reconcile_deadline_reminders,
+    send_deadline_reminder,
+)
+
+
+User = get_user_model()
+
+
+class TaskManagerTestCase(APITestCase):
+    """A member of one workspace, authenticated, with an empty cache."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="alice")
+        self.workspace = self.make_workspace(self.user)
+        self.login(self.user)
+
+    def login(self, user):
+        # A fresh instance, as authentication loads per request: workspace
+        # memberships are memoized on the user object.
+        self.client.force_authenticate(User.objects.get(pk=user.pk))
+
+    def make_workspace(self, creator, *members):
+        workspace = Workspace.objects.create(name="Workspace", creator=creator)
+        workspace.members.add(creator, *members)
+        return workspace
+
+    def make_tasks(self, count, workspace=None, **fields):
+        """Tasks with an assignee, a comment and a file each."""
+        tasks = []
+        for i in range(count):
+            task = Task.objects.create(
+                workspace=workspace or self.workspace,
+                title=f"Task {i}",
+                creator=self.user,
+                **fields,
+            )
+            task.assignees.add(self.user)
+            task_file = TaskFile.objects.create(
+                task=task, name="a.txt", file="task_files/a.txt"
+            )
+            comment = Comment.objects.create(
+                task=task, author=self.user, text="Comment"
+            )
+            comment.files.add(task_file)
+            tasks.append(task)
+        return tasks
+
+
+class QueryCountTests(TaskManagerTestCase):
+    """Lists cost the same number of queries whatever their length."""
+
+    SIZES = (1, 10, 50)
+
+    def assert_constant_queries(self, url, queries):
+        created = 0
+        for size in self.SIZES:
+            self.make_tasks(size - created)
+            created = size
+            # Served from the response cache otherwise.
+            cache.clear()
+            self.login(self.user)
+            with self.subTest(tasks=size), self.assertNumQueries(queries):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+
+    def test_task_list(self):
+        self.assert_constant_queries("/api/tasks/", 4)
+
+    def test_task_list_expanded(self):
+        self.assert_constant_queries(
+            "/api/tasks/?expand=description,comments,files", 9
+        )
+
+    def test_comments_by_workspace(self):
+        self.assert_constant_queries(
+            f"/api/comments/by-workspace/?workspace_id={self.workspace.pk}", 3
+        )
+
+    def test_task_retrieve(self):
+        for size in self.SIZES:
+            (task,) = self.make_tasks(1)
+            for _ in range(size - 1):
+                comment = Comment.objects.create(
+                    task=task, author=self.user, text="More"
+                )
+                comment.files.add(task.files.get())
+            cache.clear()
+            self.login(self.user)
+            with self.subTest(comments=size), self.assertNumQueries(8):
+                response = self.client.get(f"/api/tasks/{task.pk}/")
+            self.assertEqual(len(response.data["comments"]), size)
+
+
+class SyncTests(TaskManagerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.other = self.make_workspace(self.user)
+        self.login(self.user)
+
+    def sync(self, workspace, token=None):
+        response = self.client.get(
+            f"/api/workspaces/{workspace.pk}/changes/",
+            {"since": token} if token else {},
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_tokens(self):
+        token = self.sync(self.workspace)["next"]
+        response = self.client.get(
+            f"/api/workspaces/{self.other.pk}/changes/", {"since": token}
+        )
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(
+            f"/api/workspaces/{self.workspace.pk}/changes/",
+            {"since": token + "x"},
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_deleted_task(self):
+        (task,) = self.make_tasks(1)
+        comment = task.comments.get()
+        pk = task.pk
+        token = self.sync(self.workspace)["next"]
+        task.delete()
+        changes = self.sync(self.workspace, token)
+        self.assertEqual(changes["deleted"]["tasks"], [pk])
+        # Dropped with their task.
+        self.assertNotIn(comment.pk, changes["deleted"]["comments"])
+
+    def test_moved_task(self):
+        (task,) = self.make_tasks(1)
+        comment = task.comments.get()
+        tokens = [self.sync(w)["next"] for w in (self.workspace, self.other)]
+        response = self.client.patch(
+            f"/api/tasks/{task.pk}/",
+            {"workspace": self.other.pk},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assert_moved(task, comment, *tokens)
+
+    def test_bulk_moved_task(self):
+        (task,) = self.make_tasks(1)
+        comment = task.comments.get()
+        tokens = [self.sync(w)["next"] for w in (self.workspace, self.other)]
+        response = self.client.patch(
+            "/api/tasks/bulk/",
+            [{"id": task.pk, "workspace": self.other.pk}],
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assert_moved(task, comment, *tokens)
+
+    def assert_moved(self, task, comment, old_token, new_token):
+        old = self.sync(self.workspace, old_token)
+        self.assertEqual(old["deleted"]["tasks"], [task.pk])
+        new = self.sync(self.other, new_token)
+        self.assertEqual([t["id"] for t in new["tasks"]], [task.pk])
+        self.assertEqual([c["id"] for c in new["comments"]], [comment.pk])
+
+        # Moved back, it is no longer deleted from the first workspace.
+        task.refresh_from_db()
+        task.workspace = self.workspace
+        task.save()
+        old = self.sync(self.workspace, old_token)
+        self.assertEqual([t["id"] for t in old["tasks"]], [task.pk])
+        self.assertEqual(old["deleted"]["tasks"], [])
+
+    def test_delete_user(self):
+        self.make_tasks(2)
+        self.user.delete()
+        self.assertFalse(Workspace.objects.exists())
+        self.assertFalse(Task.objects.exists())
+
+
+class ImportTests(TaskManagerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.colleague = User.objects.create_user(username="bob")
+        self.stranger = User.objects.create_user(username="eve")
+        self.workspace.members.add(self.colleague)
+        self.login(self.user)
+
+    def import_records(self, *records):
+        workspace = {
+            "type": "workspace",
+            "id": 1,
+            "name": "Imported",
+            "creator": "eve",
+            "members": ["bob", "eve"],
+        }
+        lines = "".join(json.dumps(r) + "\n" for r in (workspace, *records))
+        return self.client.post(
+            "/api/workspaces/import/",
+            {"file": SimpleUploadedFile("export.jsonl", lines.encode())},
+        )
+
+    def task(self, **fields):
+        return {
+            "type": "task",
+            "id": 1,
+            "title": "Task",
+            "creator": "eve",
+            "assignees": ["bob", "eve"],
+            **fields,
+        }
+
+    def test_users(self):
+        response = self.import_records(
+            self.task(),
+            {
+                "type": "comment",
+                "id": 1,
+                "task": 1,
+                "author": "eve",
+                "text": "Hi",
+                "files": [],
+            },
+        )
+        self.assertEqual(response.status_code, 201)
+        workspace = Workspace.objects.get(pk=response.data["workspace"])
+        self.assertEqual(
+            set(workspace.members.all()), {self.user, self.colleague}
+        )
+        task = workspace.tasks.get()
+        self.assertEqual(task.creator, self.user)
+        self.assertEqual(list(task.assignees.all()), [self.colleague])
+        self.assertEqual(task.comments.get().author, self.user)
+
+    def test_deadline_notified(self):
+        notify_upcoming_deadlines()
+        deadline = timezone.now() + timedelta(hours=2)
+        response = self.import_records(
+            self.task(
+                deadline=deadline.isoformat(),
+                updated_at="2020-01-01T00:00:00+00:00",
+            )
+        )
+        self.assertEqual(response.status_code, 201)
+        # The assignee and the owner, who became the creator.
+        self.assertEqual(notify_upcoming_deadlines(), 2)
+
+    def test_invalid_values(self):
+        for fields in (
+            {"status": "hacked"},
+            {"priority": "urgent"},
+            {"title": "x" * 256},
+            {"deadline": "tomorrow"},
+        ):
+            with self.subTest(**fields):
+                response = self.import_records(self.task(**fields))
+                self.assertEqual(response.status_code, 400)
+        self.assertFalse(Workspace.objects.filter(name="Imported").exists())
+
+    def test_malformed(self):
+        for name, content in (
+            ("export.jsonl", b'{"type": "workspace", "name": "W"}\n[1, 2]\n'),
+            ("export.jsonl", b'{"type": "workspace", "name": "W"}\n{"x\n'),
+            ("export.jsonl", json.dumps(self.task(assignees=3)).encode()),
+            ("export.csv", b"type,name\nworkspace,W\ntask,x\n"),
+            ("export.csv", b"type,name\nworkspace," + b"W" * 200000),
+            ("export.csv", b"name\nW\n"),
+        ):
+            with self.subTest(content=content[:50]):
+                response = self.client.post(
+                    "/api/workspaces/import/",
+                    {"file": SimpleUploadedFile(name, content)},
+                )
+                self.assertEqual(response.status_code, 400)
+
+        path = tempfile.mktemp(suffix=".jsonl")
+        with open(path, "w") as fh:
+            fh.write('{"type": "workspace", "name": "W"}\n"task"\n')
+        self.addCleanup(os.remove, path)
+        with self.assertRaises(CommandError):
+            call_command("import_workspace", path, owner="alice")
+
+    def test_files(self):
+        (task,) = self.make_tasks(1)
+        mine = task.files.get().file.name
+        hidden = self.make_workspace(self.stranger)
+        Task.objects.create(workspace=hidden, title="x", creator=self.stranger)
+        TaskFile.objects.create(
+            task=hidden.tasks.get(), file="task_files/secret.txt"
+        )
+        response = self.import_records(
+            self.task(),
+            {"type": "file", "id": 1, "task": 1, "file": mine},
+            {
+                "type": "file",
+                "id": 2,
+                "task": 1,
+                "file": "task_files/secret.txt",
+            },
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["files"], 1)
+        self.assertEqual(response.data["skipped"], 1)
+
+
+@override_settings(CACHE_SHARED=True)
+class CacheInvalidationTests(TaskManagerTestCase):
+    def test_removed_member(self):
+        colleague = User.objects.create_user(username="bob")
+        self.workspace.members.add(colleague)
+        self.login(colleague)
+        url = f"/api/workspaces/{self.workspace.pk}/"
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.workspace.members.remove(colleague)
+        self.login(colleague)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_cached_list(self):
+        (task,) = self.make_tasks(1)
+        url = f"/api/tasks/?workflow_id={self.workspace.pk}"
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(
+                f"/api/tasks/{task.pk}/", {"title": "Renamed"}, format="json"
+            )
+        self.login(self.user)
+        response = self.client.get(url)
+        self.assertEqual(response.data["results"][0]["title"], "Renamed")
+
+    def test_generated_thumbnail(self):
+        (task,) = self.make_tasks(1)
+        task_file = task.files.get()
+        # A copy of the same blob whose thumbnail is reused.
+        TaskFile.objects.create(
+            task=task,
+            file=task_file.file.name,
+            thumbnail="task_files/thumbnails/a.png",
+        )
+        url = f"/api/tasks/?workflow_id={self.workspace.pk}&expand=files"
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            generate_thumbnail(task_file.pk)
+        self.login(self.user)
+        files = self.client.get(url).data["results"][0]["files"]
+        self.assertTrue(all(f["thumbnail_url"] for f in files))
+
+    @override_settings(CACHE_SHARED=False)
+    def test_local_response_cache(self):
+        self.make_tasks(1)
+        url = f"/api/tasks/?workflow_id={self.workspace.pk}"
+        self.client.get(url)
+        with mock.patch.object(ListModelMixin, "list") as render:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        render.assert_not_called()
+
+    @override_settings(CACHE_SHARED=False)
+    def test_process_local_cache(self):
+        key = f"workspaces:member:{self.user.pk}"
+        self.assertEqual(get_workspace_ids(self.user), {self.workspace.pk})
+        self.assertIsNotNone(cache.get(key))
+
+        # Once another process runs, its writes can't invalidate our cache.
+        other = cache_module._processes_dir() / str(os.getppid())
+        other.touch()
+        self.addCleanup(other.unlink)
+        cache.clear()
+        with mock.patch.object(cache_module, "_other_process_seen", False):
+            self.login(self.user)
+            self.client.get("/api/tasks/")
+            self.assertIsNone(cache.get(key))
+
+
+class ConditionalRequestTests(TaskManagerTestCase):
+    def assert_revalidated(self, url, change):
+        response = self.client.get(url)
+        etag = response["ETag"]
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+        change()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_task_list(self):
+        (task,) = self.make_tasks(1)
+        self.assert_revalidated(
+            "/api/tasks/", lambda: Task.objects.get(pk=task.pk).save()
+        )
+
+    def test_task_list_deletion(self):
+        first, second = self.make_tasks(2)
+        self.assert_revalidated("/api/tasks/", second.delete)
+
+    def test_expanded_comments(self):
+        (task,) = self.make_tasks(1)
+        self.assert_revalidated(
+            "/api/tasks/?expand=comments",
+            lambda: Comment.objects.create(
+                task=task, author=self.user, text="New"
+            ),
+        )
+
+    def test_expanded_thumbnails(self):
+        (task,) = self.make_tasks(1)
+        self.assert_revalidated(
+            "/api/tasks/?expand=files",
+            lambda: task.files.update(thumbnail="task_files/thumbnails/a"),
+        )
+
+    def rename_user(self):
+        User.objects.filter(pk=self.user.pk).update(username="alicia")
+
+    def test_workspace(self):
+        self.assert_revalidated(
+            f"/api/workspaces/{self.workspace.pk}/", self.rename_user
+        )
+
+    def test_workspace_list(self):
+        self.assert_revalidated(
+            "/api/workspaces/",
+            lambda: self.workspace.members.add(
+                User.objects.create_user(username="bob")
+            ),
+        )
+
+    def test_task_assignee_renamed(self):
+        (task,) = self.make_tasks(1)
+        self.assert_revalidated(f"/api/tasks/{task.pk}/", self.rename_user)
+
+    def test_comment_thumbnails(self):
+        (task,) = self.make_tasks(1)
+        self.assert_revalidated(
+            "/api/comments/",
+            lambda: task.files.update(thumbnail="task_files/thumbnails/a"),
+        )
+
+    def test_comment_files_swapped(self):
+        (task,) = self.make_tasks(1)
+        comment = task.comments.get()
+        other = TaskFile.objects.create(
+            task=task, name="b.txt", file="task_files/b.txt"
+        )
+
+        def swap():
+            comment.files.clear()
+            comment.files.add(other)
+
+        self.assert_revalidated("/api/comments/", swap)
+
+    def test_task_retrieve(self):
+        (task,) = self.make_tasks(1)
+        self.assert_revalidated(
+            f"/api/tasks/{task.pk}/",
+            lambda: task.comments.get().delete(),
+        )
+
+
+class MediaTestCase(TaskManagerTestCase):
+    """Stores files in a temporary directory."""
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media = override_settings(
+            MEDIA_ROOT=media_root,
+            CHUNKED_UPLOAD_ROOT=f"{media_root}/uploads",
+        )
+        media.enable()
+        self.addCleanup(media.disable)
+        (self.task,) = self.make_tasks(1)
+
+
+class FileTests(MediaTestCase):
+    def test_thumbnail(self):
+        task_file = self.task.files.get()
+        url = f"/api/files/{task_file.pk}/thumbnail/"
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+        task_file.thumbnail.save("a.png", ContentFile(b"png"))
+        response = self.client.get(f"/api/files/{task_file.pk}/")
+        self.assertEqual(
+            response.data["thumbnail_url"], f"http://testserver{url}"
+        )
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), b"png")
+        self.assertTrue(response["Content-Disposition"].startswith("inline"))
+
+        self.login(User.objects.create_user(username="bob"))
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class RangeTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        task_file = self.task.files.get()
+        task_file.file.save("a.txt", ContentFile(b"0123456789"))
+        self.url = f"/api/files/{task_file.pk}/download/"
+
+    def get(self, range_header, **headers):
+        return self.client.get(self.url, HTTP_RANGE=range_header, **headers)
+
+    def test_ranges(self):
+        for header, content_range, content in (
+            ("bytes=-3", "bytes 7-9/10", b"789"),
+            ("bytes=4-", "bytes 4-9/10", b"456789"),
+            ("bytes=2-4", "bytes 2-4/10", b"234"),
+            ("bytes=8-20", "bytes 8-9/10", b"89"),
+        ):
+            with self.subTest(header):
+                response = self.get(header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(response["Content-Range"], content_range)
+                self.assertEqual(b"".join(response.streaming_content), content)
+
+    def test_unsatisfiable(self):
+        for header in ("bytes=10-", "bytes=20-30", "bytes=5-2"):
+            with self.subTest(header):
+                response = self.get(header)
+                self.assertEqual(response.status_code, 416)
+                self.assertEqual(response["Content-Range"], "bytes */10")
+
+    def test_whole_file(self):
+        # Several ranges, or a stale If-Range, get the whole file.
+        etag = self.client.get(self.url)["ETag"]
+        for header, if_range in (
+            ("bytes=0-1,4-5", etag),
+            ("bytes=0-1", '"stale"'),
+        ):
+            with self.subTest(header, if_range=if_range):
+                response = self.get(header, HTTP_IF_RANGE=if_range)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    b"".join(response.streaming_content), b"0123456789"
+                )
+        response = self.get("bytes=0-1", HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+
+
+class BlobTests(MediaTestCase):
+    def store(self, content, age=0):
+        task_file = TaskFile(task=self.task, name="a.txt")
+        task_file.file.save("a.txt", ContentFile(content), save=False)
+        path = task_file.file.path
+        os.utime(path, (os.stat(path).st_atime, os.stat(path).st_mtime - age))
+        return task_file
+
+    def test_purge_orphaned_blobs(self):
+        day = 24 * 60 * 60
+        kept = self.store(b"kept", age=2 * day)
+        kept.save()
+        fresh = self.store(b"fresh")
+        orphan = self.store(b"orphan", age=2 * day)
+        reused = self.store(b"reused", age=2 * day)
+        # An upload of the same content, its row not saved yet.
+        self.store(b"reused")
+
+        self.assertEqual(purge_orphaned_blobs(), 1)
+        storage = kept.file.storage
+        self.assertFalse(storage.exists(orphan.file.name))
+        for task_file in (kept, fresh, reused):
+            self.assertTrue(storage.exists(task_file.file.name))
+
+
+class UploadTests(MediaTestCase):
+
+    def start(self, content):
+        return self.client.post(
+            "/api/files/uploads/",
+            {
+                "task": self.task.pk,
+                "filename": "notes.txt",
+                "size": len(content),
+                "sha256": hashlib.sha256(content).hexdigest(),
+            },
+            format="json",
+        )
+
+    def put_part(self, upload, number, content):
+        return self.client.put(
+            f"/api/files/uploads/{upload}/parts/{number}/",
+            content,
+            content_type="application/octet-stream",
+        )
+
+    def test_upload(self):
+        upload = self.start(b"hello world").data["id"]
+        self.assertEqual(self.put_part(upload, 0, b"hello ").status_code, 200)
+        self.assertEqual(self.put_part(upload, 1, b"world").status_code, 200)
+        response = self.client.post(f"/api/files/uploads/{upload}/complete/")
+        self.assertEqual(response.status_code, 201)
+        task_file = TaskFile.objects.get(pk=response.data["id"])
+        self.assertEqual(task_file.file.read(), b"hello world")
+
+    def test_empty_part(self):
+        upload = self.start(b"hello").data["id"]
+        self.assertEqual(self.put_part(upload, 0, b"").status_code, 400)
+
+    def test_parts_larger_than_upload(self):
+        upload = self.start(b"hello").data["id"]
+        self.assertEqual(self.put_part(upload, 0, b"hel").status_code, 200)
+        self.assertEqual(self.put_part(upload, 1, b"lo!").status_code, 400)
+        # Retrying a part replaces it.
+        self.assertEqual(self.put_part(upload, 0, b"hell").status_code, 200)
+
+    @override_settings(CHUNKED_UPLOAD_MAX_SIZE=4)
+    def test_size_limit(self):
+        self.assertEqual(self.start(b"hello").status_code, 400)
+
+    def test_part_number(self):
+        upload = self.start(b"hello").data["id"]
+        self.assertEqual(self.put_part(upload, 5, b"o").status_code, 400)
+        self.assertEqual(
+            self.put_part(upload, "9" * 5000, b"o").status_code, 400
+        )
+
+    def test_missing_parts(self):
+        upload = self.start(b"x" * 100).data["id"]
+        self.assertEqual(self.put_part(upload, 50, b"x").status_code, 200)
+        response = self.client.post(f"/api/files/uploads/{upload}/complete/")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.data["detail"],
+            "Missing parts: 0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, "
+            "14, 15, 16, 17, 18, 19 and 30 more.",
+        )
+
+    def test_other_users_upload(self):
+        upload = self.start(b"hello").data["id"]
+        self.login(User.objects.create_user(username="bob"))
+        self.assertEqual(self.put_part(upload, 0, b"hello").status_code, 404)
+
+
+@override_settings(DEADLINE_REMINDERS_MODE="eta")
+class DeadlineReminderTests(TaskManagerTestCase):
+    def test_broker_down(self):
+        deadline = timezone.now() + timedelta(days=3)
+        down = mock.patch.object(
+            send_deadline_reminder,
+            "apply_async",
+            side_effect=OperationalError("Connection refused"),
+        )
+        with down, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/api/tasks/",
+                {
+                    "workspace": self.workspace.pk,
+                    "title": "Task",
+                    "deadline": deadline.isoformat(),
+                    "assignee_ids": [self.user.pk],
+                },
+                format="json",
+            )
+        self.assertEqual(response.status_code, 201)
+        task = Task.objects.get(pk=response.data["id"])
+        self.assertEqual(task.reminder_task_id, "")
+
+        # Repaired once the broker is back.
+        with mock.patch.object(send_deadline_reminder, "apply_async") as up:
+            up.return_value.id = "reminder"
+            result = reconcile_deadline_reminders()
+        self.assertEqual(result["scheduled"], 1)
+        task.refresh_from_db()
+        self.assertEqual(task.reminder_task_id, "reminder")
+
+
+class EventTests(TaskManagerTestCase):
+    def events(self, write):
+        with mock.patch(
+            "task_manager.realtime.get_broker"
+        ) as broker, self.captureOnCommitCallbacks(execute=True):
+            write()
+        return [
+            (event["type"], event["data"]["assignees"])
+            for call in broker.return_value.publish_many.call_args_list
+            for _, message in call.args[0]
+            if (event := json.loads(message))["type"].startswith("task.")
+        ]
+
+    def test_one_event_per_edit(self):
+        colleague = User.objects.create_user(username="bob")
+        self.workspace.members.add(colleague)
+        (task,) = self.make_tasks(1)
+        events = self.events(
+            lambda: self.client.patch(
+                f"/api/tasks/{task.pk}/",
+                {"title": "Renamed", "assignee_ids": [colleague.pk]},
+                format="json",
+            )
+        )
+        self.assertEqual(events, [("task.updated", [colleague.pk])])
+
+        events = self.events(
+            lambda: self.client.post(
+                "/api/tasks/",
+                {
+                    "workspace": self.workspace.pk,
+                    "title": "New",
+                    "assignee_ids": [colleague.pk],
+                },
+                format="json",
+            )
+        )
+        self.assertEqual(events, [("task.created", [colleague.pk])])
+
+        task = Task.objects.get(pk=task.pk)
+        events = self.events(lambda: task.assignees.add(self.user))
+        self.assertEqual(
+            events, [("task.updated", sorted([self.user.pk, colleague.pk]))]
+        )
+
+
+class MetricsTests(TaskManagerTestCase):
+    @override_settings(DEBUG=True)
+    def test_requests_counted(self):
+        self.client.get("/api/tasks/")
+        body = self.client.get("/metrics").content.decode()
+        self.assertIn(
+            'http_requests_total{method="GET",status="200",'
+            'view="TaskViewSet.list"}',
+            body,
+        )
+
+    def test_no_token(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 404)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_token(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 401)
+        response = self.client.get(
+            "/metrics", HTTP_AUTHORIZATION="Bearer secret"
+        )
+        self.assertEqual(response.status_code, 200)
+
+
+class ExclusiveJobTests(TestCase):
+    def test_overlapping_runs(self):
+        overlapping = []
+
+        @instrumented(exclusive=True)
+        def job(nested=False):
+            if not nested:
+                # As if started meanwhile by another worker.
+                overlapping.append(job(nested=True))
+            return 1
+
+        self.assertEqual(job(), 1)
+        self.assertEqual(overlapping, [None])
+        self.assertEqual(job(), 1)
+        self.assertEqual(JobLock.objects.get(name="job").run_id, "")
+
+    def test_expired_lease(self):
+        @instrumented(exclusive=True)
+        def job():
+            return 1
+
+        JobLock.objects.create(
+            name="job", run_id="crashed", expires_at=timezone.now()
+        )
+        self.assertEqual(job(), 1)
+
+
+class CalendarTests(TaskManagerTestCase):
+    def setUp(self):
+        super().setUp()
+        # Tuesday in UTC, still Monday evening in New York.
+        deadline = datetime(2026, 3, 10, 2, 30, tzinfo=dt_timezone.utc)
+        (self.task,) = self.make_tasks(1, deadline=deadline)
+
+    def calendar(self, tz):
+        response = self.client.get(
+            "/api/tasks/calendar/",
+            {
+                "workspace_id": self.workspace.pk,
+                "from": "2026-03-09",
+                "to": "2026-03-10",
+                "tz": tz,
+                "include": "tasks",
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        return {
+            str(day["date"]): [task["id"] for task in day["tasks"]]
+            for day in response.data["days"]
+            if day["total"]
+        }
+
+    def test_calendar_time_zone(self):
+        self.assertEqual(self.calendar("UTC"), {"2026-03-10": [self.task.pk]})
+        self.assertEqual(
+            self.calendar("America/New_York"), {"2026-03-09": [self.task.pk]}
+        )
+
+    def test_by_date_time_zone(self):
+        url = f"/api/tasks/by-date/?workspace_id={self.workspace.pk}&date="
+        for time_zone, date, found in (
+            ("UTC", "2026-03-09", []),
+            ("UTC", "2026-03-10", [self.task.pk]),
+            ("America/New_York", "2026-03-09", [self.task.pk]),
+            ("America/New_York", "2026-03-10", []),
+        ):
+            with self.subTest(time_zone, date=date), self.settings(
+                TIME_ZONE=time_zone
+            ):
+                # Cached by URL: TIME_ZONE doesn't change while running.
+                cache.clear()
+                response = self.client.get(url + date)
+                self.assertEqual([task["id"] for task in response.data], found)
+
+
+class SearchTests(TaskManagerTestCase):
+    def search(self, query, **params):
+        response = self.client.get("/api/search/", {"q": query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [hit["task"] for hit in response.data["results"]]
+
+    def test_special_characters(self):
+        (task,) = self.make_tasks(1, description='Deploy the "api" (v2)')
+        for query in ('"api', 'deploy "api" (v2', "api) -deploy: *", "depl"):
+            with self.subTest(query=query):
+                self.assertEqual(self.search(query), [task.pk])
+        # Operators are searched as words, and the scope column is not.
+        for query in ("deploy AND api", f"w{self.workspace.pk}", "'\"*"):
+            with self.subTest(query=query):
+                self.assertEqual(self.search(query), [])
+
+    def test_other_workspaces(self):
+        stranger = User.objects.create_user(username="eve")
+        hidden = self.make_workspace(stranger)
+        Task.objects.create(workspace=hidden, title="Deploy", creator=stranger)
+        (task,) = self.make_tasks(1, description="Deploy")
+        self.assertEqual(self.search("deploy"), [task.pk])
+
+        other = self.make_workspace(self.user)
+        self.make_tasks(1, workspace=other, description="Deploy")
+        self.login(self.user)
+        self.assertEqual(
+            self.search("deploy", workspace_id=self.workspace.pk), [task.pk]
+        )
+        response = self.client.get(
+            "/api/search/", {"q": "deploy", "workspace_id": hidden.pk}
+        )
+        self.assertEqual(response.status_code, 403)
+
+    def test_postgres_query(self):
+        with mock.patch("task_manager.search.connection") as connection:
+            cursor = connection.cursor.return_value.__enter__.return_value
+            cursor.fetchall.return_value = [("task", 1, 0.5, "snippet")]
+            hits = PostgresSearchBackend().search(
+                'fix "deploy) & !api', {3, 1}, limit=10, offset=20
+            )
+        self.assertEqual(
+            hits,
+            [{"type": "task", "id": 1, "rank": 0.5, "snippet": "snippet"}],
+        )
+        sql, params = cursor.execute.call_args.args
+        self.assertEqual(params["query"], "fix & deploy & api:*")
+        self.assertEqual(params["workspaces"], [1, 3])
+        self.assertEqual((params["limit"], params["offset"]), (10, 20))
+        self.assertEqual(sql.count("t.workspace_id = ANY(%(workspaces)s)"), 2)
+
+    def test_postgres_empty_query(self):
+        with mock.patch("task_manager.search.connection") as connection:
+            self.assertEqual(
+                PostgresSearchBackend().search("!&|", {1}, 10, 0), []
+            )
+        connection.cursor.assert_not_called()
+
+
+class DeadlineNotificationTests(TaskManagerTestCase):
+    def test_notified_once(self):
+        colleague = User.objects.create_user(username="bob")
+        (task,) = self.make_tasks(
+            1, deadline=timezone.now() + timedelta(hours=12)
+        )
+        task.assignees.add(colleague)
+        tasks = Task.objects.filter(pk=task.pk)
+        with mock.patch("task_manager.tasks.publish_events") as publish:
+            self.assertEqual(create_deadline_notifications(tasks), 2)
+            self.assertEqual(create_deadline_notifications(tasks), 0)
+        self.assertEqual(len(list(publish.call_args_list[0].args[0])), 2)
+
+    def test_rescheduled_into_scanned_horizon(self):
+        (task,) = self.make_tasks(
+            1, deadline=timezone.now() + timedelta(days=3)
+        )
+        self.assertEqual(notify_upcoming_deadlines(), 0)
+        # Now due before the horizon the first run already covered.
+        task.deadline = timezone.now() + timedelta(hours=6)
+        task.save()
+        self.assertEqual(notify_upcoming_deadlines(), 1)
+
+    def test_second_run(self):
+        self.make_tasks(1, deadline=timezone.now() + timedelta(hours=6))
+        self.assertEqual(notify_upcoming_deadlines(), 1)
+        self.assertEqual(notify_upcoming_deadlines(), 0)
+        self.assertEqual(Notification.objects.count(), 1)
+
+        # Untouched since, the task is not even examined again.
+        Task.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        with mock.patch(
+            "task_manager.tasks.create_deadline_notifications",
+            return_value=0,
+        ) as create:
+            notify_upcoming_deadlines()
+        self.assertFalse(create.call_args.args[0].exists())
+
+    def test_concurrent_run(self):
+        colleague = User.objects.create_user(username="bob")
+        (task,) = self.make_tasks(
+            1, deadline=timezone.now() + timedelta(hours=12)
+        )
+        task.assignees.add(colleague)
+        # Another run notified bob after this one listed the recipients.
+        pending = [(self.user.pk, task.pk), (colleague.pk, task.pk)]
+        Notification.objects.create(user=colleague, task=task, message="x")
+        with mock.patch(
+            "task_manager.tasks._pending_recipients"
+        ) as recipients, mock.patch(
+            "task_manager.tasks.publish_events"
+        ) as publish:
+            recipients.return_value.iterator.return_value = iter(pending)
+            created = create_deadline_notifications(Task.objects.all())
+        self.assertEqual(created, 1)
+        (events,) = publish.call_args.args
+        self.assertEqual(
+            [event[2]["user"] for event in events], [self.user.pk]
+        )
+
+
+class BenchmarkTests(MediaTestCase):
+    def test_cold_run_keeps_the_rest_of_the_cache(self):
+        cache.set("unrelated", 1)
+        call_command(
+            "benchmark_api",
+            users=2,
+            workspaces=1,
+            members=2,
+            tasks=2,
+            iterations=1,
+            warmup=0,
+            only=["tasks.*"],
+            cold=True,
+            stdout=io.StringIO(),
+        )
+        self.assertEqual(cache.get("unrelated"), 1)
+
+    def test_bulk_tasks_failure(self):
+        invalid = mock.patch.object(
+            TaskSerializer,
+            "validate",
+            side_effect=ValidationError("Rejected."),
+        )
+        with invalid, self.assertRaisesMessage(CommandError, "answered 400"):
+            call_command("benchmark_bulk_tasks", tasks=2, stdout=io.StringIO())
+
+
+class PaginationTests(TaskManagerTestCase):
+    def walk(self, url):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.data)
+            url = response.data["next"]
+        return pages
+
+    def ids(self, pages):
+        return [task["id"] for page in pages for task in page["results"]]
+
+    def test_ties(self):
+        tasks = self.make_tasks(5)
+        # Same creation time for all: only the id orders them.
+        Task.objects.update(created_at=timezone.now())
+        pages = self.walk("/api/tasks/?page_size=2")
+        expected = sorted((task.pk for task in tasks), reverse=True)
+        self.assertEqual(self.ids(pages), expected)
+
+        # And back again.
+        url, previous = pages[-1]["previous"], []
+        while url:
+            response = self.client.get(url)
+            previous.insert(0, response.data)
+            url = response.data["previous"]
+        self.assertEqual(self.ids(previous), expected[:4])
+
+    def test_ordering(self):
+        now = timezone.now()
+        tasks = self.make_tasks(4)
+        for i, task in enumerate(tasks):
+            task.deadline = now + timedelta(days=i // 2)
+            task.save()
+        pages = self.walk("/api/tasks/?ordering=deadline&page_size=3")
+        self.assertEqual(self.ids(pages), [task.pk for task in tasks])
+
+    def test_invalid_cursor(self):
+        self.make_tasks(1)
+        response = self.client.get("/api/tasks/?cursor=cD1ub3RhZGF0ZQ==")
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,84 @@
+import io
+import mimetypes
+import os
+import shutil
+import subprocess
+import tempfile
+
+from django.core.files.base import ContentFile
+
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover
+    Image = None
+
+
+THUMBNAIL_SIZE = (320, 320)
+PDF_RENDER_TIMEOUT = 30
+
+
+def _image_thumbnail(fh):
+    if Image is None:
+        return None
+
+    try:
+        image = Image.open(fh)
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(THUMBNAIL_SIZE)
+    except (OSError, Image.DecompressionBombError):
+        return None
+
+    buffer = io.BytesIO()
+    if image.mode in ("RGBA", "LA", "P"):
+        image.save(buffer, format="PNG", optimize=True)
+        return ContentFile(buffer.getvalue(), name="thumbnail.png")
+
+    image.convert("RGB").save(buffer, format="JPEG", quality=80)
+    return ContentFile(buffer.getvalue(), name="thumbnail.jpg")
+
+
+def _pdf_preview(path):
+    pdftoppm = shutil.which("pdftoppm")
+    if pdftoppm is None:
+        return None
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        prefix = os.path.join(output_dir, "preview")
+        try:
+            subprocess.run(
+                [
+                    pdftoppm,
+                    "-png",
+                    "-singlefile",
+                    "-f",
+                    "1",
+                    "-scale-to",
+                    str(max(THUMBNAIL_SIZE)),
+                    path,
+                    prefix,
+                ],
+                check=True,
+                capture_output=True,
+                timeout=PDF_RENDER_TIMEOUT,
+            )
+            with open(prefix + ".png", "rb") as fh:
+                return ContentFile(fh.read(), name="thumbnail.png")
+        except (OSError, subprocess.SubprocessError):
+            return None
+
+
+def render_thumbnail(field_file, filename=None):
+    """
+    Renders a small preview of ``field_file``: a thumbnail for images
+    (requires Pillow) and a first-page preview for PDFs (requires
+    poppler's ``pdftoppm``). Returns ``None`` for anything else.
+    """
+    content_type = mimetypes.guess_type(filename or field_file.name)[0] or ""
+
+    if content_type.startswith("image/"):
+        with field_file.open("rb") as fh:
+            return _image_thumbnail(fh)
+    if content_type == "application/pdf":
+        return _pdf_preview(field_file.path)
+    return None
@@ -0,0 +1,132 @@
+import hashlib
+import os
+import shutil
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+
+
+READ_SIZE = 1024 * 1024
+MAX_PART_SIZE = 64 * 1024 * 1024
+# How many missing parts an error lists at most.
+MAX_LISTED_PARTS = 20
+
+
+class UploadError(Exception):
+    pass
+
+
+class AssembledFile(File):
+    """
+    A file assembled on local disk; storages that support it move it into
+    place instead of copying it again.
+    """
+
+    def __init__(self, file, name=None, sha256=None):
+        super().__init__(file, name)
+        self.sha256 = sha256
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def session_dir(session):
+    return Path(settings.CHUNKED_UPLOAD_ROOT) / str(session.pk)
+
+
+def part_path(session, number):
+    return session_dir(session) / f"{number:06d}.part"
+
+
+def received_parts(session):
+    directory = session_dir(session)
+    if not directory.is_dir():
+        return []
+    parts = [
+        {"number": int(path.stem), "size": path.stat().st_size}
+        for path in directory.glob("*.part")
+    ]
+    return sorted(parts, key=lambda part: part["number"])
+
+
+def write_part(session, number, stream):
+    """
+    Streams ``stream`` into part ``number`` of ``session``. The part only
+    replaces a previous attempt once it has been fully received, and is
+    rejected as soon as the parts would add up to more than the session's
+    size.
+    """
+    path = part_path(session, number)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_suffix(".partial")
+    remaining = session.size - sum(
+        part["size"]
+        for part in received_parts(session)
+        if part["number"] != number
+    )
+
+    written = 0
+    try:
+        with open(partial, "wb") as fh:
+            while chunk := stream.read(READ_SIZE):
+                written += len(chunk)
+                if written > MAX_PART_SIZE:
+                    raise UploadError(
+                        f"Parts can be at most {MAX_PART_SIZE} bytes."
+                    )
+                if written > remaining:
+                    raise UploadError(
+                        f"The parts exceed the {session.size} bytes "
+                        "announced."
+                    )
+                fh.write(chunk)
+    except BaseException:
+        partial.unlink(missing_ok=True)
+        raise
+
+    os.replace(partial, path)
+    return written
+
+
+def assemble(session):
+    """
+    Concatenates the parts of ``session`` into a single file without
+    loading it in memory, checking its size and SHA-256 along the way.
+    Returns the path of the assembled file.
+    """
+    parts = received_parts(session)
+    if not parts:
+        raise UploadError("No parts received.")
+    numbers = [part["number"] for part in parts]
+    if len(numbers) != numbers[-1] + 1:
+        received = set(numbers)
+        missing = [
+            number for number in range(numbers[-1]) if number not in received
+        ]
+        listed = ", ".join(map(str, missing[:MAX_LISTED_PARTS]))
+        if len(missing) > MAX_LISTED_PARTS:
+            listed += f" and {len(missing) - MAX_LISTED_PARTS} more"
+        raise UploadError(f"Missing parts: {listed}.")
+
+    size = sum(part["size"] for part in parts)
+    if size != session.size:
+        raise UploadError(f"Expected {session.size} bytes, received {size}.")
+
+    target = session_dir(session) / "assembled"
+    digest = hashlib.sha256()
+    with open(target, "wb") as out:
+        for number in numbers:
+            with open(part_path(session, number), "rb") as part:
+                while chunk := part.read(READ_SIZE):
+                    digest.update(chunk)
+                    out.write(chunk)
+
+    if digest.hexdigest() != session.sha256:
+        target.unlink()
+        raise UploadError("Checksum mismatch.")
+    return target
+
+
+def discard(session):
+    shutil.rmtree(session_dir(session), ignore_errors=True)
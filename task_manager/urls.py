@@ -8,6 +8,9 @@ from task_manager.views import (
     TaskViewSet,
     WorkspaceViewSet,
     get_workspace_details,
+    notification_events,
+    search_view,
+    workspace_events,
 )
 
 
@@ -19,6 +22,17 @@ router.register(r"files", TaskFileViewSet, basename="files")
 router.register(r"notifications", NotificationViewSet, basename="notification")
 
 urlpatterns = [
+    path(
+        "workspaces/<int:workspace_id>/events/",
+        workspace_events,
+        name="workspace-events",
+    ),
+    path(
+        "notifications/events/",
+        notification_events,
+        name="notification-events",
+    ),
+    path("search/", search_view, name="search"),
     path("", include(router.urls)),
     path(
         "workspace/<int:workspace_id>/",
@@ -1,8 +1,19 @@
-from datetime import datetime
+import io
+import zoneinfo
+from datetime import datetime, time, timedelta
+from functools import partial
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db.models import Count, Max, Q
+from django.db.models.functions import TruncDate
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import cached_property
+from django.utils.http import content_disposition_header
 from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import (
     action,
@@ -10,36 +21,104 @@ from rest_framework.decorators import (
     authentication_classes,
     permission_classes,
 )
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from rest_framework_simplejwt.authentication import JWTAuthentication
 
+from task_manager import bulk, metrics, snapshots, sync, uploads
+from task_manager.cache import (
+    get_unread_count,
+    get_workspace_ids,
+    invalidate_unread_counts,
+    is_workspace_member,
+)
+from task_manager.conditional import (
+    conditional_response,
+    last_deleted_at,
+    latest,
+    make_etag,
+)
+from task_manager.downloads import serve_file
 from task_manager.models import (
     Comment,
     Notification,
     Task,
     TaskFile,
+    UploadSession,
     Workspace,
 )
+from task_manager.pagination import (
+    CreatedAtCursorPagination,
+    TaskCursorPagination,
+)
 from task_manager.permissions import IsWorkspaceMember
+from task_manager.realtime import event_stream, user_channel, workspace_channel
+from task_manager.response_cache import cached_response
+from task_manager.search import search
 from task_manager.serializers import (
     CommentSerializer,
+    NotificationMarkReadSerializer,
     NotificationSerializer,
+    TaskBulkCreateSerializer,
+    TaskBulkUpdateSerializer,
     TaskFileSerializer,
+    TaskFilterSerializer,
     TaskSerializer,
+    TaskSummarySerializer,
+    UploadSessionSerializer,
     WorkspaceSerializer,
 )
+from users.serializers import UserSerializer
 
 
 User = get_user_model()
 
+CALENDAR_MAX_DAYS = 62
+
+
+def workspace_state(workspace_ids):
+    """
+    The rows a workspace renders, its members included: neither has a
+    modification time, so the validators are derived from their values.
+    """
+    return list(
+        Workspace.objects.filter(pk__in=workspace_ids)
+        .order_by("pk", "members__id")
+        .values_list(
+            "pk",
+            "name",
+            "created_at",
+            *(f"members__{field}" for field in UserSerializer.Meta.fields),
+        )
+    )
+
 
 class WorkspaceViewSet(viewsets.ModelViewSet):
     serializer_class = WorkspaceSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Workspace.objects.filter(members=self.request.user)
+        return Workspace.objects.filter(
+            pk__in=get_workspace_ids(self.request.user)
+        )
+
+    def list(self, request, *args, **kwargs):
+        state = workspace_state(get_workspace_ids(request.user))
+        etag = make_etag("workspaces", request.get_full_path(), state)
+        return conditional_response(
+            request, partial(super().list, request, *args, **kwargs), etag
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        render = partial(super().retrieve, request, *args, **kwargs)
+        pk = kwargs["pk"]
+        if not pk.isdigit() or int(pk) not in get_workspace_ids(request.user):
+            return render()
+
+        etag = make_etag("workspace", pk, workspace_state([int(pk)]))
+        return conditional_response(request, render, etag)
 
     def perform_create(self, serializer):
         workspace = serializer.save()
@@ -63,7 +142,7 @@ class WorkspaceViewSet(viewsets.ModelViewSet):
                 {"detail": "User not found"}, status=status.HTTP_404_NOT_FOUND
             )
 
-        if user in workspace.members.all():
+        if is_workspace_member(user, workspace.pk):
             return Response(
                 {"detail": "User is already a member"},
                 status=status.HTTP_400_BAD_REQUEST,
@@ -75,21 +154,253 @@ class WorkspaceViewSet(viewsets.ModelViewSet):
             status=status.HTTP_200_OK,
         )
 
+    @action(detail=True, methods=["get"])
+    def export(self, request, pk=None):
+        workspace = self.get_object()
+        file_format = request.query_params.get("file_format", "jsonl")
+        if file_format not in snapshots.FORMATS:
+            return Response(
+                {"detail": "file_format must be jsonl or csv."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        writer = snapshots.WRITERS[file_format]
+        response = StreamingHttpResponse(
+            writer(snapshots.export_records(workspace)),
+            content_type=snapshots.FORMATS[file_format],
+        )
+        response["Content-Disposition"] = content_disposition_header(
+            as_attachment=True,
+            filename=f"workspace-{workspace.pk}.{file_format}",
+        )
+        return response
+
+    @action(detail=False, methods=["post"], url_path="import")
+    def import_snapshot(self, request):
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response(
+                {"detail": "file is required."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        file_format = request.data.get("file_format") or (
+            "csv" if upload.name.endswith(".csv") else "jsonl"
+        )
+        if file_format not in snapshots.READERS:
+            return Response(
+                {"detail": "file_format must be jsonl or csv."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        lines = io.TextIOWrapper(upload.file, encoding="utf-8", newline="")
+        try:
+            workspace, counts = snapshots.import_records(
+                snapshots.READERS[file_format](lines),
+                request.user,
+                name=request.data.get("name"),
+            )
+        except snapshots.SnapshotError as e:
+            return Response(
+                {"detail": f"Invalid export: {e}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return Response(
+            {"workspace": workspace.pk, **counts},
+            status=status.HTTP_201_CREATED,
+        )
+
+    @action(detail=True, methods=["get"])
+    def changes(self, request, pk=None):
+        workspace = self.get_object()
+
+        try:
+            since = sync.read_token(
+                request.query_params.get("since"), workspace.pk
+            )
+        except sync.InvalidSyncToken as e:
+            return Response(
+                {"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST
+            )
+        except sync.ExpiredSyncToken as e:
+            return Response({"detail": str(e)}, status=status.HTTP_410_GONE)
+
+        return Response(
+            sync.changes_since(
+                workspace, since, context=self.get_serializer_context()
+            )
+        )
+
 
 class TaskViewSet(viewsets.ModelViewSet):
     serializer_class = TaskSerializer
     permission_classes = [permissions.IsAuthenticated, IsWorkspaceMember]
+    pagination_class = TaskCursorPagination
 
-    def get_queryset(self):
-        queryset = Task.objects.filter(workspace__members=self.request.user)
+    def get_serializer_class(self):
+        if self.action == "list":
+            return TaskSummarySerializer
+        return TaskSerializer
+
+    def get_tasks(self):
+        queryset = Task.objects.filter(
+            workspace__in=get_workspace_ids(self.request.user)
+        )
         workflow_id = self.request.query_params.get("workflow_id")
         if workflow_id is not None:
             queryset = queryset.filter(workspace=workflow_id)
+        if self.action == "list":
+            queryset = self.task_filters.filter_queryset(queryset)
         return queryset
 
+    @cached_property
+    def task_filters(self):
+        serializer = TaskFilterSerializer(data=self.request.query_params)
+        serializer.is_valid(raise_exception=True)
+        return serializer
+
+    def get_ordering(self):
+        return self.task_filters.validated_data.get("ordering")
+
+    def get_queryset(self):
+        return self.get_serializer().setup_eager_loading(self.get_tasks())
+
+    def get_cached_workspace_ids(self, workspace_id):
+        """
+        The workspaces a cached response for ``workspace_id`` (all of the
+        user's when ``None``) depends on, or ``None`` if it can't be
+        shared with other members.
+        """
+        workspace_ids = get_workspace_ids(self.request.user)
+        if workspace_id is None:
+            return workspace_ids
+        if workspace_id.isdigit() and int(workspace_id) in workspace_ids:
+            return [int(workspace_id)]
+        return None
+
+    def list(self, request, *args, **kwargs):
+        tasks = self.get_tasks()
+        member_ids = get_workspace_ids(request.user)
+        state = tasks.aggregate(
+            count=Count("id"),
+            updated_at=Max("updated_at"),
+            deleted_at=last_deleted_at(member_ids, "task"),
+        )
+        # Expanded comments and files are part of the representation, as
+        # in retrieve(); they are aggregated apart to avoid joining them.
+        fields = self.get_serializer().fields
+        if "comments" in fields:
+            state.update(
+                Comment.objects.filter(task__in=tasks).aggregate(
+                    comment_count=Count("id"),
+                    comments_updated_at=Max("updated_at"),
+                    comments_deleted_at=last_deleted_at(member_ids, "comment"),
+                )
+            )
+        if "comments" in fields or "files" in fields:
+            state.update(
+                TaskFile.objects.filter(task__in=tasks).aggregate(
+                    file_count=Count("id"),
+                    files_uploaded_at=Max("uploaded_at"),
+                    thumbnail_count=Count("id", filter=~Q(thumbnail="")),
+                )
+            )
+        etag = make_etag(
+            "tasks", request.user.pk, request.get_full_path(), *state.values()
+        )
+        render = partial(super().list, request, *args, **kwargs)
+        workspace_ids = self.get_cached_workspace_ids(
+            request.query_params.get("workflow_id")
+        )
+        # Tasks become overdue without any write to invalidate the cache.
+        overdue = self.task_filters.validated_data.get("overdue")
+        if workspace_ids is not None and overdue is None:
+            render = partial(cached_response, request, workspace_ids, render)
+        return conditional_response(
+            request,
+            render,
+            etag,
+            latest(
+                *(value for key, value in state.items() if key.endswith("_at"))
+            ),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        render = partial(super().retrieve, request, *args, **kwargs)
+        pk = kwargs["pk"]
+        if not pk.isdigit():
+            return render()
+
+        # Comments and files are part of the representation; counts catch
+        # deletions and thumbnails generated after the upload.
+        state = (
+            self.get_tasks()
+            .filter(pk=pk)
+            .aggregate(
+                updated_at=Max("updated_at"),
+                comment_count=Count("comments", distinct=True),
+                comments_updated_at=Max("comments__updated_at"),
+                file_count=Count("files", distinct=True),
+                files_uploaded_at=Max("files__uploaded_at"),
+                thumbnail_count=Count(
+                    "files", filter=~Q(files__thumbnail=""), distinct=True
+                ),
+            )
+        )
+        if state["updated_at"] is None:
+            return render()
+        # Assignees are rendered nested and have no modification time.
+        assignees = User.objects.filter(assigned_tasks=pk).order_by("pk")
+        state["assignees"] = list(
+            assignees.values_list(*UserSerializer.Meta.fields)
+        )
+
+        etag = make_etag("task", pk, request.get_full_path(), *state.values())
+        return conditional_response(
+            request,
+            render,
+            etag,
+            latest(
+                state["updated_at"],
+                state["comments_updated_at"],
+                state["files_uploaded_at"],
+            ),
+        )
+
     def perform_create(self, serializer):
         serializer.save(creator=self.request.user)
 
+    @action(detail=False, methods=["post", "patch"], url_path="bulk")
+    def bulk(self, request):
+        is_update = request.method == "PATCH"
+        serializer_class = (
+            TaskBulkUpdateSerializer if is_update else TaskBulkCreateSerializer
+        )
+        serializer = serializer_class(
+            data=request.data,
+            many=True,
+            partial=is_update,
+            allow_empty=False,
+            max_length=bulk.BULK_MAX_TASKS,
+            context=self.get_serializer_context(),
+        )
+        serializer.is_valid(raise_exception=True)
+
+        if is_update:
+            tasks = bulk.update_tasks(serializer.validated_data)
+        else:
+            tasks = bulk.create_tasks(serializer.validated_data, request.user)
+
+        data = TaskSummarySerializer(
+            tasks, many=True, context=self.get_serializer_context()
+        ).data
+        return Response(
+            data,
+            status=(
+                status.HTTP_200_OK if is_update else status.HTTP_201_CREATED
+            ),
+        )
+
     @action(detail=False, methods=["get"], url_path="by-date")
     def tasks_by_date(self, request):
         workspace_id = request.query_params.get("workspace_id")
@@ -116,19 +427,133 @@ class TaskViewSet(viewsets.ModelViewSet):
             datetime.combine(target_date, datetime.max.time())
         )
 
-        tasks = Task.objects.filter(
-            workspace__id=workspace_id,
-            workspace__members=request.user,
-            deadline__range=(start_datetime, end_datetime),
-        )
+        def render():
+            tasks = Task.objects.filter(
+                workspace__id=workspace_id,
+                workspace__in=get_workspace_ids(request.user),
+                deadline__range=(start_datetime, end_datetime),
+            )
+            tasks = self.get_serializer().setup_eager_loading(tasks)
+
+            serializer = self.get_serializer(tasks, many=True)
+            return Response(serializer.data)
+
+        workspace_ids = self.get_cached_workspace_ids(workspace_id)
+        if workspace_ids is None:
+            return render()
+        return cached_response(request, workspace_ids, render)
+
+    @action(detail=False, methods=["get"])
+    def calendar(self, request):
+        workspace_id = request.query_params.get("workspace_id")
+        date_from = request.query_params.get("from")
+        date_to = request.query_params.get("to")
+
+        if not workspace_id or not date_from or not date_to:
+            return Response(
+                {"detail": "workspace_id, from and to are required."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            date_from = datetime.strptime(date_from, "%Y-%m-%d").date()
+            date_to = datetime.strptime(date_to, "%Y-%m-%d").date()
+        except ValueError:
+            return Response(
+                {"detail": "Invalid date format. Use YYYY-MM-DD."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if not 0 <= (date_to - date_from).days < CALENDAR_MAX_DAYS:
+            return Response(
+                {
+                    "detail": "to must be on or after from, at most "
+                    f"{CALENDAR_MAX_DAYS} days later."
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            tz = zoneinfo.ZoneInfo(
+                request.query_params.get("tz", settings.TIME_ZONE)
+            )
+        except (ValueError, zoneinfo.ZoneInfoNotFoundError):
+            return Response(
+                {"detail": "Unknown time zone."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if not workspace_id.isdigit():
+            return Response(
+                {"detail": "workspace_id must be an integer."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        workspace_ids = self.get_cached_workspace_ids(workspace_id)
+        if workspace_ids is None:
+            return Response(
+                {"detail": "You are not a member of this workspace."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+        include_tasks = request.query_params.get("include") == "tasks"
+
+        def render():
+            tasks = Task.objects.filter(
+                workspace_id=workspace_id,
+                deadline__gte=datetime.combine(date_from, time.min, tz),
+                deadline__lt=datetime.combine(
+                    date_to + timedelta(days=1), time.min, tz
+                ),
+            )
+            days = {
+                date_from
+                + timedelta(days=offset): {
+                    "date": date_from + timedelta(days=offset),
+                    "total": 0,
+                    "status": dict.fromkeys(dict(Task.STATUS_CHOICES), 0),
+                    "priority": dict.fromkeys(dict(Task.PRIORITY_CHOICES), 0),
+                }
+                for offset in range((date_to - date_from).days + 1)
+            }
+
+            # Days are bucketed by the database in the requested zone.
+            counts = (
+                tasks.annotate(day=TruncDate("deadline", tzinfo=tz))
+                .values("day", "status", "priority")
+                .annotate(count=Count("id"))
+                .order_by()
+            )
+            for row in counts:
+                day = days[row["day"]]
+                day["total"] += row["count"]
+                day["status"][row["status"]] += row["count"]
+                day["priority"][row["priority"]] += row["count"]
+
+            if include_tasks:
+                for day in days.values():
+                    day["tasks"] = []
+                stubs = tasks.order_by("deadline", "id").values(
+                    "id", "title", "status", "priority", "deadline"
+                )
+                for stub in stubs:
+                    days[stub["deadline"].astimezone(tz).date()][
+                        "tasks"
+                    ].append(stub)
+
+            return Response(
+                {
+                    "from": date_from,
+                    "to": date_to,
+                    "tz": str(tz),
+                    "days": list(days.values()),
+                }
+            )
 
-        serializer = self.get_serializer(tasks, many=True)
-        return Response(serializer.data)
+        return cached_response(request, workspace_ids, render)
 
 
 class CommentViewSet(viewsets.ModelViewSet):
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
 
     def create(self, request):
         serializer = self.get_serializer(data=request.data)
@@ -138,8 +563,49 @@ class CommentViewSet(viewsets.ModelViewSet):
         return Response(CommentSerializer(comment).data, status=201)
 
     def get_queryset(self):
-        return Comment.objects.filter(
-            task__workspace__members=self.request.user
+        queryset = Comment.objects.filter(
+            task__workspace__in=get_workspace_ids(self.request.user)
+        )
+        return self.get_serializer().setup_eager_loading(queryset)
+
+    def list(self, request, *args, **kwargs):
+        workspace_ids = get_workspace_ids(request.user)
+        comments = Comment.objects.filter(task__workspace__in=workspace_ids)
+        state = comments.aggregate(
+            count=Count("id"),
+            updated_at=Max("updated_at"),
+            deleted_at=last_deleted_at(workspace_ids, "comment"),
+        )
+        # Nested files are part of the representation. Attaching a file
+        # doesn't touch the comment, but adds a row with a greater id.
+        state.update(
+            Comment.files.through.objects.filter(
+                comment__in=comments
+            ).aggregate(link_count=Count("id"), last_link_id=Max("id"))
+        )
+        state.update(
+            TaskFile.objects.filter(comments__in=comments).aggregate(
+                files_uploaded_at=Max("uploaded_at"),
+                thumbnail_count=Count(
+                    "id", filter=~Q(thumbnail=""), distinct=True
+                ),
+            )
+        )
+        etag = make_etag(
+            "comments",
+            request.user.pk,
+            request.get_full_path(),
+            *state.values(),
+        )
+        return conditional_response(
+            request,
+            partial(super().list, request, *args, **kwargs),
+            etag,
+            latest(
+                state["updated_at"],
+                state["deleted_at"],
+                state["files_uploaded_at"],
+            ),
         )
 
     def perform_create(self, serializer):
@@ -157,27 +623,36 @@ class CommentViewSet(viewsets.ModelViewSet):
             )
 
         try:
-            workspace = Workspace.objects.get(id=workspace_id)
-        except Workspace.DoesNotExist:
+            workspace_id = int(workspace_id)
+        except ValueError:
             return Response(
-                {"detail": "Workspace not found."},
-                status=status.HTTP_404_NOT_FOUND,
+                {"detail": "workspace_id must be an integer."},
+                status=status.HTTP_400_BAD_REQUEST,
             )
 
-        if request.user not in workspace.members.all():
+        if not is_workspace_member(request.user, workspace_id):
+            if not Workspace.objects.filter(id=workspace_id).exists():
+                return Response(
+                    {"detail": "Workspace not found."},
+                    status=status.HTTP_404_NOT_FOUND,
+                )
             return Response(
                 {"detail": "You are not a member of this workspace."},
                 status=status.HTTP_403_FORBIDDEN,
             )
 
-        comments = Comment.objects.filter(task__workspace=workspace)
+        def render():
+            comments = Comment.objects.filter(task__workspace_id=workspace_id)
 
-        if task_id:
-            comments = comments.filter(task_id=task_id)
+            if task_id:
+                comments = comments.filter(task_id=task_id)
 
-        comments = comments.select_related("task", "author")
-        serializer = self.get_serializer(comments, many=True)
-        return Response(serializer.data)
+            comments = self.get_serializer().setup_eager_loading(comments)
+            page = self.paginate_queryset(comments)
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        return cached_response(request, [workspace_id], render)
 
 
 class TaskFileViewSet(viewsets.ModelViewSet):
@@ -186,8 +661,113 @@ class TaskFileViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         return TaskFile.objects.filter(
-            task__workspace__members=self.request.user
+            task__workspace__in=get_workspace_ids(self.request.user)
+        )
+
+    @action(detail=True, methods=["get"])
+    def download(self, request, pk=None):
+        task_file = self.get_object()
+        return serve_file(request, task_file.file, filename=task_file.name)
+
+    @action(detail=True, methods=["get"])
+    def thumbnail(self, request, pk=None):
+        task_file = self.get_object()
+        if not task_file.thumbnail:
+            return Response(
+                {"detail": "No thumbnail yet."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        return serve_file(request, task_file.thumbnail, as_attachment=False)
+
+    def get_upload_session(self, upload_id):
+        return get_object_or_404(
+            UploadSession, pk=upload_id, user=self.request.user
+        )
+
+    @action(detail=False, methods=["post"], url_path="uploads")
+    def start_upload(self, request):
+        serializer = UploadSessionSerializer(
+            data=request.data, context=self.get_serializer_context()
         )
+        serializer.is_valid(raise_exception=True)
+        serializer.save(user=request.user)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @action(
+        detail=False,
+        methods=["get", "delete"],
+        url_path=r"uploads/(?P<upload_id>[0-9a-f-]+)",
+    )
+    def upload(self, request, upload_id):
+        session = self.get_upload_session(upload_id)
+
+        if request.method == "DELETE":
+            uploads.discard(session)
+            session.delete()
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        return Response(UploadSessionSerializer(session).data)
+
+    @action(
+        detail=False,
+        methods=["put"],
+        url_path=r"uploads/(?P<upload_id>[0-9a-f-]+)/parts/(?P<number>[0-9]+)",
+    )
+    def upload_part(self, request, upload_id, number):
+        session = self.get_upload_session(upload_id)
+        # DRF has no stream for a request without a body.
+        if request.stream is None:
+            return Response(
+                {"detail": "The part is empty."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # Every part holds at least one byte of the upload.
+        limit = min(settings.CHUNKED_UPLOAD_MAX_PARTS, session.size)
+        if len(number) > len(str(limit)) or int(number) >= limit:
+            return Response(
+                {"detail": f"Parts are numbered from 0 to {limit - 1}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            size = uploads.write_part(session, int(number), request.stream)
+        except uploads.UploadError as e:
+            return Response(
+                {"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response({"number": int(number), "size": size})
+
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path=r"uploads/(?P<upload_id>[0-9a-f-]+)/complete",
+    )
+    def complete_upload(self, request, upload_id):
+        session = self.get_upload_session(upload_id)
+
+        try:
+            path = uploads.assemble(session)
+        except uploads.UploadError as e:
+            return Response(
+                {"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        task_file = TaskFile(task=session.task, name=session.filename)
+        with open(path, "rb") as fh:
+            task_file.file.save(
+                session.filename,
+                uploads.AssembledFile(fh, sha256=session.sha256),
+                save=False,
+            )
+        task_file.save()
+
+        uploads.discard(session)
+        session.delete()
+
+        serializer = self.get_serializer(task_file)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
 @api_view(["GET"])
@@ -196,20 +776,186 @@ class TaskFileViewSet(viewsets.ModelViewSet):
 def get_workspace_details(request, workspace_id):
     workspace = get_object_or_404(Workspace, id=workspace_id)
 
-    if request.user != workspace.creator:
+    if request.user.pk != workspace.creator_id:
         return Response(
             {"detail": "Access denied."}, status=status.HTTP_403_FORBIDDEN
         )
 
-    serializer = WorkspaceSerializer(workspace)
-    return Response(serializer.data)
+    return conditional_response(
+        request,
+        lambda: Response(WorkspaceSerializer(workspace).data),
+        make_etag("workspace", workspace.pk, workspace_state([workspace.pk])),
+    )
+
+
+@api_view(["GET"])
+@authentication_classes([JWTAuthentication])
+@permission_classes([IsAuthenticated])
+def search_view(request):
+    query = request.query_params.get("q", "").strip()
+    workspace_id = request.query_params.get("workspace_id")
+
+    if not query:
+        return Response(
+            {"detail": "q is required."}, status=status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        limit = min(int(request.query_params.get("page_size", 20)), 100)
+        offset = int(request.query_params.get("offset", 0))
+    except ValueError:
+        return Response(
+            {"detail": "page_size and offset must be integers."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    if limit < 1 or offset < 0:
+        return Response(
+            {"detail": "page_size and offset must be positive."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    workspace_ids = get_workspace_ids(request.user)
+    if workspace_id is not None:
+        if not workspace_id.isdigit():
+            return Response(
+                {"detail": "workspace_id must be an integer."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if int(workspace_id) not in workspace_ids:
+            return Response(
+                {"detail": "You are not a member of this workspace."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+        workspace_ids = [int(workspace_id)]
+
+    # One extra hit tells whether there is a next page without counting.
+    hits = search(query, workspace_ids, limit + 1, offset)
+    url = request.build_absolute_uri()
+    return Response(
+        {
+            "next": (
+                replace_query_param(url, "offset", offset + limit)
+                if len(hits) > limit
+                else None
+            ),
+            "previous": (
+                replace_query_param(url, "offset", max(offset - limit, 0))
+                if offset
+                else None
+            ),
+            "results": hits[:limit],
+        }
+    )
 
 
 class NotificationViewSet(viewsets.ModelViewSet):
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
 
     def get_queryset(self):
         return Notification.objects.filter(user=self.request.user).order_by(
-            "-created_at"
+            "-created_at", "-id"
         )
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        invalidate_unread_counts([instance.user_id])
+
+    @action(detail=False, methods=["get"], url_path="unread-count")
+    def unread_count(self, request):
+        return Response({"unread_count": get_unread_count(request.user.id)})
+
+    @action(detail=False, methods=["post"], url_path="mark-read")
+    def mark_read(self, request):
+        serializer = NotificationMarkReadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        notifications = Notification.objects.filter(
+            user=request.user, is_read=False
+        )
+        ids = serializer.validated_data.get("ids")
+        if ids is not None:
+            notifications = notifications.filter(id__in=ids)
+
+        updated = notifications.update(is_read=True)
+        if updated:
+            invalidate_unread_counts([request.user.id])
+        return Response({"updated": updated})
+
+
+def _authenticate_stream(request):
+    # EventSource can't send headers, so the JWT may come as ?token=.
+    authentication = JWTAuthentication()
+    try:
+        token = request.GET.get("token")
+        if token:
+            return authentication.get_user(
+                authentication.get_validated_token(token)
+            )
+        result = authentication.authenticate(request)
+    except AuthenticationFailed:
+        return None
+    return result[0] if result else None
+
+
+def _event_stream_response(channel):
+    response = StreamingHttpResponse(
+        event_stream(channel), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+async def workspace_events(request, workspace_id):
+    """
+    Server-sent events stream of task, comment and file changes in a
+    workspace. Needs the ASGI entry point (config.asgi).
+    """
+    user = await sync_to_async(_authenticate_stream)(request)
+    if user is None:
+        return JsonResponse(
+            {"detail": "Authentication credentials were not provided."},
+            status=status.HTTP_401_UNAUTHORIZED,
+        )
+
+    if not await sync_to_async(is_workspace_member)(user, workspace_id):
+        return JsonResponse(
+            {"detail": "You are not a member of this workspace."},
+            status=status.HTTP_403_FORBIDDEN,
+        )
+
+    return _event_stream_response(workspace_channel(workspace_id))
+
+
+async def notification_events(request):
+    """Server-sent events stream of the user's new notifications."""
+    user = await sync_to_async(_authenticate_stream)(request)
+    if user is None:
+        return JsonResponse(
+            {"detail": "Authentication credentials were not provided."},
+            status=status.HTTP_401_UNAUTHORIZED,
+        )
+
+    return _event_stream_response(user_channel(user.pk))
+
+
+def metrics_view(request):
+    """
+    Prometheus metrics of every web and worker process sharing the cache.
+    Needs an "Authorization: Bearer <METRICS_TOKEN>" header; without a
+    token it is only served in DEBUG.
+    """
+    token = settings.METRICS_TOKEN
+    if not token:
+        if not settings.DEBUG:
+            return HttpResponse(status=status.HTTP_404_NOT_FOUND)
+    elif not constant_time_compare(
+        request.headers.get("Authorization", ""), f"Bearer {token}"
+    ):
+        return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+
+    return HttpResponse(
+        metrics.render(metrics.collect()), content_type=metrics.CONTENT_TYPE
+    )